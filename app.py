@@ -2,10 +2,24 @@
 Main application module for Flask app
 """
 from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+from flask_compress import Compress
+from jinja2 import FileSystemBytecodeCache
 from dotenv import load_dotenv
+import orjson
 import os
 import logging
 
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider using orjson to serialize and parse JSON"""
+    
+    def dumps(self, obj, **kwargs):
+        # Fall back to Flask's default for types orjson doesn't handle natively
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 def create_app(test_config=None):
     """Create and configure the Flask application."""
     # Load environment variables
@@ -13,6 +27,11 @@ def create_app(test_config=None):
     
     # Create Flask app
     app = Flask(__name__)
+    app.json = ORJSONProvider(app)
+    
+    # Only enable debug mode for local development, never at import time in production
+    if os.getenv("FLASK_ENV") == "development":
+        app.debug = True
     
     # Configure logging to ensure all messages appear in the terminal
     if app.debug:
@@ -41,10 +60,29 @@ def create_app(test_config=None):
     # Set request timeout
     app.config['TIMEOUT'] = 300  # 5 minutes timeout
     
+    # Only watch templates for changes during development, in production every
+    # render would otherwise stat the template file
+    app.config['TEMPLATES_AUTO_RELOAD'] = app.debug
+    app.jinja_env.auto_reload = app.debug
+    if not app.debug:
+        # Keep the compiled templates on disk so restarted workers don't parse them again
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+    
+    # Compress text responses (Brotli when the client supports it, gzip otherwise)
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    app.config['COMPRESS_LEVEL'] = 4
+    app.config['COMPRESS_BR_LEVEL'] = 4
+    app.config['COMPRESS_MIN_SIZE'] = 512
+    app.config['COMPRESS_MIMETYPES'] = ['text/html', 'text/css', 'text/javascript', 'application/javascript', 'application/json']
+    # Never buffer streamed responses (Server-Sent Events) to compress them
+    app.config['COMPRESS_STREAMS'] = False
+    
     # Override config with test config if provided
     if test_config:
         app.config.update(test_config)
     
+    Compress(app)
+    
     # Register error handlers
     @app.errorhandler(413)
     def request_entity_too_large(error):
@@ -58,11 +96,16 @@ def create_app(test_config=None):
     from routes import register_routes
     register_routes(app)
     
+    # Compile every template up front, before Gunicorn forks the workers,
+    # so the first request to each page doesn't pay for it
+    if not app.debug:
+        for template_name in app.jinja_env.list_templates(extensions=['html']):
+            app.jinja_env.get_template(template_name)
+    
     return app
 
 # Create a global app instance for 'flask run' to find automatically
 app = create_app()
-app.debug = True  # Set debug mode on by default
 
 # For running the app directly
 if __name__ == "__main__":
@@ -0,0 +1,31 @@
+"""
+Gunicorn configuration for running the Flask app in production
+"""
+import os
+
+# Bind to the port provided by the environment (Cloud Run sets PORT)
+bind = f":{os.getenv('PORT', '8080')}"
+
+# The workload is I/O-bound (LLM, GCS, Notion), so threaded workers let
+# blocking calls overlap instead of serializing the whole worker
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", 3))
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+
+# Load the app once in the master and share it across the forked workers
+preload_app = True
+
+# LLM and indexing requests can take several minutes
+timeout = 300
+
+# Recycle workers periodically to keep memory usage in check
+max_requests = 500
+max_requests_jitter = 50
+
+# Keep the heartbeat files in memory instead of on disk
+worker_tmp_dir = "/dev/shm"
+
+# Allow large uploads and long request lines
+limit_request_line = 0
+limit_request_fields = 0
+limit_request_field_size = 0
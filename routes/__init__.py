@@ -24,4 +24,8 @@ def register_routes(app):
     app.register_blueprint(chatbot_bp)
     
     # Register all file-related blueprints
-    register_file_blueprints(app)
\ No newline at end of file
+    register_file_blueprints(app)
+    
+    # Add the cache headers once for every route, instead of a hook per blueprint
+    from routes.file.route_utils import add_cache_headers
+    app.after_request(add_cache_headers)
\ No newline at end of file
@@ -1,21 +1,187 @@
 """
 Chatbot routes for the application
 """
-import asyncio
-import nest_asyncio
-from flask import Blueprint, render_template, request, jsonify, current_app, make_response, Response, stream_with_context, session
+import queue
+import re
+import sys
+import time
+import orjson
+from flask import Blueprint, render_template, request, jsonify, current_app, make_response, Response, stream_with_context
 from services.llm_service import get_available_indexes
 from services.llm.chat import get_query_response_full, get_agent_response_full
+from services.llm.exact_cache import LLMCache, llm_cache, is_cacheable, cache_response_chunks
+from services.llm.semantic_cache import semantic_cache, embed_question, cache_semantic_response_chunks
+from services.utils.async_loop import submit_async
     
 # Create a Blueprint for chatbot routes
 chatbot_bp = Blueprint('chatbot', __name__, url_prefix='/chatbot')
 
-def add_cache_headers(response):
-    """Add cache control headers to response"""
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    return response
+# Chat message template, compiled when the blueprint is registered
+_chat_message_template = None
+
+# Largest chat request accepted (message, history and settings)
+MAX_CHAT_REQUEST_SIZE = 2 * 1024 * 1024  # 2MB in bytes
+
+# Longest time to wait for the agent workflow, a bit more than the workflow's own timeout
+AGENT_RESPONSE_TIMEOUT = 150  # seconds
+# How often the agent stream checks whether the workflow has finished
+AGENT_PROGRESS_POLL_INTERVAL = 0.5  # seconds
+
+# Longest message accepted, matches the counter shown in the chat input
+MAX_MESSAGE_LENGTH = 2000
+
+# Greetings and acknowledgements answered without calling the LLM
+TRIVIAL_MESSAGE_RE = re.compile(r"^(hi|hello|hey|thanks|thank you|ok|okay|bye)[\s.!?]*$", re.IGNORECASE)
+TRIVIAL_REPLIES = {
+    'hi': "Hello! What would you like to know?",
+    'hello': "Hello! What would you like to know?",
+    'hey': "Hello! What would you like to know?",
+    'thanks': "You're welcome! Let me know if you have another question.",
+    'thank you': "You're welcome! Let me know if you have another question.",
+    'ok': "Let me know if you have another question.",
+    'okay': "Let me know if you have another question.",
+    'bye': "Goodbye!"
+}
+
+class ProgressMessage(str):
+    """A progress update sent while the answer is being prepared, not part of the answer"""
+
+def sse_stream(response_generator):
+    """Wrap a generator of response chunks into Server-Sent Events frames"""
+    # Send the headers and a comment frame straight away, before the context
+    # retrieval and the first token, so the client knows the stream is open
+    yield ": stream opened\n\n"
+    for chunk in response_generator:
+        if not chunk:
+            continue
+        if isinstance(chunk, ProgressMessage):
+            yield f"event: status\ndata: {orjson.dumps({'status': chunk}).decode()}\n\n"
+            continue
+        if chunk.startswith("Error: "):
+            yield f"event: error\ndata: {orjson.dumps({'error': chunk.split('Error: ', 1)[-1]}).decode()}\n\n"
+            return
+        yield f"data: {orjson.dumps({'token': chunk}).decode()}\n\n"
+    yield "event: end\ndata: {}\n\n"
+
+def event_stream_response(response_generator, headers=None):
+    """Build a Server-Sent Events response streaming the response chunks"""
+    return Response(stream_with_context(sse_stream(response_generator)),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', **(headers or {})})
+
+def get_chat_form():
+    """Read the chat parameters from the submitted form in a single pass"""
+    # Convert the MultiDict once, then every field is a plain dict lookup
+    form = request.form.to_dict(flat=False)
+    return {
+        'message': form.get('message', [''])[0].strip(),
+        'lstMessageHistory': form.get('lstMessagesHistory[]', []),
+        'temperature': form.get('temperature', ['1'])[0],
+        'maxTokens': form.get('maxToken', ['2000'])[0],
+        'modules': form.get('modules', [''])[0],
+        'useRag': form.get('useRag', ['false'])[0].lower() == 'true',
+        'mode': form.get('mode', ['files'])[0],
+        # Drop repeated index IDs while keeping their order, interned so the
+        # index and metadata cache lookups compare them by identity
+        'listOfIndexes': list(dict.fromkeys(sys.intern(index_id) for index_id in form.get('listOfIndexes[]', [])))
+    }
+
+@chatbot_bp.record_once
+def load_chat_message_template(state):
+    """Compile the chat message template once, when the blueprint is registered"""
+    global _chat_message_template
+    _chat_message_template = state.app.jinja_env.get_template('components/chat_messages.html')
+
+def render_chat_message(**context):
+    """Render a chat message fragment from the precompiled template"""
+    # Go through the loader during development so template edits are picked up
+    if current_app.debug:
+        return render_template('components/chat_messages.html', **context)
+    current_app.update_template_context(context)
+    return _chat_message_template.render(context)
+
+def check_chat_request():
+    """
+    Validate a chat request before calling the LLM.
+    
+    Returns:
+        tuple: The parsed chat form and an error response, or None if the request is valid
+    """
+    # Refuse oversized bodies before parsing the form
+    if request.content_length and request.content_length > MAX_CHAT_REQUEST_SIZE:
+        return None, render_chat_message(user_message='',
+                                         ai_response="Request too large.",
+                                         response_type="Error",
+                                         ai_only=True,
+                                         response_element_id=1)
+    
+    chat_form = get_chat_form()
+    
+    # Nothing to answer, don't call the LLM
+    if not chat_form['message']:
+        return chat_form, render_chat_message(user_message='',
+                                              ai_response="Please enter a message.",
+                                              response_type="Error",
+                                              ai_only=True,
+                                              response_element_id=1)
+    
+    # Error fragments are sent with a 200 status, the chat only renders the bodies of successful responses
+    if len(chat_form['message']) > MAX_MESSAGE_LENGTH:
+        return chat_form, render_chat_message(user_message='',
+                                              ai_response=f"Message too long, the limit is {MAX_MESSAGE_LENGTH} characters.",
+                                              response_type="Error",
+                                              ai_only=True,
+                                              response_element_id=1)
+    
+    # Answer greetings directly, they don't need the LLM or the indexes
+    trivial_match = TRIVIAL_MESSAGE_RE.match(chat_form['message'])
+    if trivial_match:
+        return chat_form, render_chat_message(user_message=chat_form['message'],
+                                              ai_response=TRIVIAL_REPLIES[trivial_match.group(1).lower()],
+                                              response_type="AI",
+                                              ai_only=True,
+                                              response_element_id=1)
+    
+    return chat_form, None
+
+def wants_event_stream():
+    """Check if the client asked for a Server-Sent Events response"""
+    # ?stream=false forces the complete HTML fragment for clients without SSE support
+    if request.args.get('stream', '').lower() == 'false':
+        return False
+    return request.accept_mimetypes.best == 'text/event-stream'
+
+def generate_agent_response(chat_form):
+    """
+    Run the agent workflow and yield its progress messages while it runs,
+    then its answer, as an error chunk if it failed.
+    """
+    # Run the workflow on the shared event loop instead of creating one per request,
+    # it reports its steps through the queue while this generator waits for it
+    progress = queue.Queue()
+    future = submit_async(get_agent_response_full(**chat_form, on_progress=progress.put))
+    deadline = time.monotonic() + AGENT_RESPONSE_TIMEOUT
+    try:
+        while True:
+            try:
+                yield ProgressMessage(progress.get(timeout=AGENT_PROGRESS_POLL_INTERVAL))
+            except queue.Empty:
+                if future.done():
+                    break
+                if time.monotonic() > deadline:
+                    yield "Error: The agents took too long to answer, please try again."
+                    return
+        result = future.result()
+    finally:
+        # Stop the workflow if the client went away or the wait timed out
+        if not future.done():
+            future.cancel()
+
+    # The workflow returns the complete answer, or a dict when it failed
+    if isinstance(result, dict):
+        yield f"Error: {result.get('error', 'Unknown error')}"
+    elif result is not None:
+        yield str(result)
 
 @chatbot_bp.route('/')
 
@@ -25,10 +191,9 @@ def chatbot_page():
     try:
         # Get available indexes for the chatbot
         indexes = get_available_indexes()
-        response = make_response(render_template('chatbot.html', 
-                                               indexes=indexes,
-                                               messages=[]))  # Initialize empty messages
-        return add_cache_headers(response)
+        return render_template('chatbot.html', 
+                               indexes=indexes,
+                               messages=[])  # Initialize empty messages
     except Exception as e:
         current_app.logger.error(f"Error accessing chatbot page: {str(e)}")
         return make_response(jsonify({"error": str(e)}), 500)
@@ -38,43 +203,85 @@ def check_message_length():
     """Check the current message length."""
     message = request.args.get('message', '')
     length = len(message)
-    max_length = 2000
-    return f"{length}/{max_length}"
+    
+    # The count only depends on the message length, let the browser reuse it.
+    # The message is in the URL, so keep it out of shared caches.
+    response = Response(f"{length}/{MAX_MESSAGE_LENGTH}", mimetype='text/plain')
+    response.cache_control.private = True
+    response.cache_control.max_age = 60
+    response.set_etag(str(length))
+    return response.make_conditional(request)
 
 @chatbot_bp.route('/get-query-response', methods=['POST'])
 def get_query_response():
     """Get the response for a specific query."""
     try:
-        message = request.form.get('message', '').strip()
-        lstMessageHistory = request.form.getlist('lstMessagesHistory[]')
-        temperature = request.form.get('temperature', '1')
-        max_tokens = request.form.get('maxToken', '2000')
-        useRag = request.form.get('useRag', 'false').lower() == 'true'
-        mode = request.form.get('mode', 'files')
-        listOfIndexes = request.form.getlist('listOfIndexes[]')
+        chat_form, error_response = check_chat_request()
+        if error_response is not None:
+            return error_response
+        message = chat_form['message']
+        
+        stream = wants_event_stream()
+        
+        # Reuse a previous answer to the exact same deterministic request
+        cache_key = None
+        cached_response = None
+        semantic_scope = None
+        question_vector = None
+        if is_cacheable(chat_form['temperature']):
+            cache_params = {
+                'history': chat_form['lstMessageHistory'],
+                'temperature': chat_form['temperature'],
+                'maxTokens': chat_form['maxTokens'],
+                'useRag': chat_form['useRag'],
+                'mode': chat_form['mode'],
+                'indexes': sorted(set(chat_form['listOfIndexes']))
+            }
+            cache_key = LLMCache.make_key(message=message, **cache_params)
+            cached_response = llm_cache.get(cache_key)
+            
+            # Otherwise reuse the answer to a paraphrase of the question asked with the same settings
+            if cached_response is None:
+                semantic_scope = LLMCache.make_key(**cache_params)
+                question_vector = embed_question(message)
+                if question_vector is not None:
+                    cached_response = semantic_cache.get(semantic_scope, question_vector)
+        
+        if cached_response is not None:
+            response_generator = iter([cached_response])
+        else:
+            # Get query response (it returns a generator)
+            response_generator = get_query_response_full(
+                message = message,
+                lstMessageHistory=chat_form['lstMessageHistory'],
+                temperature=chat_form['temperature'],
+                maxTokens=chat_form['maxTokens'],
+                useRag=chat_form['useRag'],
+                mode=chat_form['mode'],
+                listOfIndexes=chat_form['listOfIndexes'],
+                stream=stream
+            )
+            if cache_key is not None:
+                response_generator = cache_response_chunks(response_generator, cache_key)
+            if question_vector is not None:
+                response_generator = cache_semantic_response_chunks(response_generator, semantic_scope, question_vector)
         
-        # Get query response (it returns a generator)
-        response_generator = get_query_response_full(
-            message = message,
-            lstMessageHistory=lstMessageHistory,
-            temperature=temperature,
-            maxTokens=max_tokens,
-            useRag=useRag,
-            mode=mode,
-            listOfIndexes=listOfIndexes
-        )
+        cache_headers = {}
+        if cache_key is not None:
+            cache_headers['X-Cache'] = 'HIT' if cached_response is not None else 'MISS'
+
+        # Stream the tokens to the client as they are generated
+        if stream:
+            return event_stream_response(response_generator, cache_headers)
 
         # Set a type of response for processing
         response_type = "AI"
         
         # Collect the generated response content
-        response_content = ""
-        for chunk in response_generator:
-            if chunk:
-                response_content += chunk
+        response_content = "".join(chunk for chunk in response_generator if chunk)
 
         # If the response is empty, set a default message
-        if not response_content in response_content:
+        if not response_content:
             response_content = "Sorry, I couldn't find an answer to your question. Please try again."
         
         # If the response is an error message, set it as the response content
@@ -85,12 +292,11 @@ def get_query_response():
         
         # Return the complete response as JSON
         #return jsonify({"response": response_content})
-        return render_template('components/chat_messages.html',
-                             user_message=message,
-                             ai_response=response_content,
-                             response_type=response_type,
-                             ai_only=True,
-                             response_element_id=1)  # Pass the response element ID to the template
+        return render_chat_message(user_message=message,
+                                   ai_response=response_content,
+                                   response_type=response_type,
+                                   ai_only=True,
+                                   response_element_id=1), cache_headers  # Pass the response element ID to the template
         
     except Exception as e:
         current_app.logger.error(f"Error getting query response: {str(e)}")
@@ -100,49 +306,21 @@ def get_query_response():
 def get_agent_response():
     """Get the response from the agent."""
     try:
-        message = request.form.get('message', '').strip()
-        lstMessageHistory = request.form.getlist('lstMessagesHistory[]')
-        temperature = request.form.get('temperature', '1')
-        maxTokens = request.form.get('maxToken', '2000')
-        modules = request.form.get('modules', '')
-        useRag = request.form.get('useRag', 'false').lower() == 'true'
-        mode = request.form.get('mode', 'files')
-        listOfIndexes = request.form.getlist('listOfIndexes[]')
+        chat_form, error_response = check_chat_request()
+        if error_response is not None:
+            return error_response
+        message = chat_form['message']
         
-        print(f"DEBUG get_agent_response : Message: {message},lstMessageHistory: {lstMessageHistory}, temperature: {temperature}, maxTokens: {maxTokens}, useRag: {useRag}, modules: {modules}, mode: {mode}, listOfIndexes: {listOfIndexes}")
+        current_app.logger.debug("get_agent_response: message_length=%d history_length=%d temperature=%s maxTokens=%s useRag=%s modules=%s mode=%s indexes=%s",
+                                 len(message), len(chat_form['lstMessageHistory']), chat_form['temperature'], chat_form['maxTokens'],
+                                 chat_form['useRag'], chat_form['modules'], chat_form['mode'], chat_form['listOfIndexes'])
 
-        # Apply nest_asyncio to allow nested event loops
-        nest_asyncio.apply()
-        
-        # Run the async function in the current event loop if possible
-        try:
-            # Try to get the current event loop
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            # If there's no current event loop, create a new one
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-              # Define and run the async function
-        async def run_async_function():
-            return await get_agent_response_full(
-                message=message,
-                lstMessageHistory=lstMessageHistory,
-                temperature=temperature,
-                maxTokens=maxTokens,
-                useRag=useRag,
-                modules=modules,
-                mode=mode,
-                listOfIndexes=listOfIndexes
-            )
-        
-        # Run the function in the event loop
-        response_generator = loop.run_until_complete(run_async_function())
+        # Open the stream before running the workflow, the answer is sent when it is ready
+        if wants_event_stream():
+            return event_stream_response(generate_agent_response(chat_form))
 
-        # Collect the generated response content
-        response_content = ""
-        for chunk in response_generator:
-            if chunk:
-                response_content += chunk
+        response_content = "".join(chunk for chunk in generate_agent_response(chat_form)
+                                   if not isinstance(chunk, ProgressMessage))
 
         # Set a type of response for processing
         response_type = "AI"
@@ -156,23 +334,15 @@ def get_agent_response():
             response_type = "Error"
 
         # return the response as JSON
-        print("=== End of get_agent_response ===") 
-        print(response_content)
+        current_app.logger.debug("get_agent_response: response_length=%d response_type=%s", len(response_content), response_type)
         #return jsonify(response)
-        return render_template('components/chat_messages.html',
-                             user_message=message,
-                             ai_response=response_content,
-                             response_type=response_type,
-                             ai_only=True,
-                             response_element_id=1)  # Pass the response element ID to the template
+        return render_chat_message(user_message=message,
+                                   ai_response=response_content,
+                                   response_type=response_type,
+                                   ai_only=True,
+                                   response_element_id=1)  # Pass the response element ID to the template
             
         
     except Exception as e:
         current_app.logger.error(f"Error getting agent response: {str(e)}")
         return jsonify({"error": str(e)}), 500
-
-
-@chatbot_bp.after_request
-def after_request(response):
-    """Add cache headers after each request"""
-    return add_cache_headers(response)
\ No newline at end of file
@@ -3,37 +3,31 @@ Contains routes for adding files to the LLM storage
 """
 import os
 from flask import Blueprint, request, redirect, url_for, flash, current_app
-from .route_utils import add_cache_headers
 from services.utils.cache import move_item_to_folder
 from services.document_service import process_text_file,process_pdf_file
 from services.llm_service import refresh_file_index_cache
 from services.notion_service import cache_notion_page, cache_notion_database, get_notion_client
+from .route_utils import ListParams
 
 
 file_add_bp = Blueprint('file_add', __name__, url_prefix='/files/add')
 
-@file_add_bp.after_request
-def after_request(response):
-    """Add cache headers after each request"""
-    return add_cache_headers(response)
+# Document processor for each supported file extension
+DOCUMENT_HANDLERS = {
+    '.pdf': process_pdf_file,
+    '.txt': process_text_file,
+    '.md': process_text_file
+}
 
 @file_add_bp.route("/upload-document", methods=["POST"])
 def upload_document():
     """Upload and cache a document file (PDF, TXT, MD) for LLM processing."""
     # Get pagination parameters to preserve when redirecting
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    filter_title = request.args.get('title', '')
-    filter_type = request.args.get('type', '')
+    params = ListParams.from_request()
     folder_path = request.form.get('folder_path', '').strip()
     
     # Build redirect URL with parameters - redirect to view_files after adding content
-    redirect_url = url_for("file_storage.view_files", 
-                           page=page, 
-                           per_page=per_page,
-                           title=filter_title,
-                           type=filter_type,
-                           folder=folder_path)
+    redirect_url = params.view_files_url(folder=folder_path)
     
     try:
         # Check if file was submitted
@@ -55,39 +49,30 @@ def upload_document():
         _, file_ext = os.path.splitext(file.filename)
         file_ext = file_ext.lower()
         
-        if file_ext == '.pdf':
-            result = process_pdf_file(file, file.filename, custom_name)
-            
-            # Update metadata with folder information if specified
-            if folder_path and result["success"]:
-                try:
-                    move_item_to_folder(result["doc_id"], folder_path)
-                except Exception as folder_error:
-                    current_app.logger.error(f"Error setting folder for {result['doc_id']}: {str(folder_error)}")
-                    
-            refresh_file_index_cache()  # Refresh cache after adding content
-            flash(f"Successfully cached PDF '{result['title']}' with {result['chunks']} content chunks!")
-        elif file_ext in ['.txt', '.md']:
-            result = process_text_file(file, file.filename, custom_name)
-            
-            # Update metadata with folder information if specified
-            if folder_path and result["success"]:
-                try:
-                    move_item_to_folder(result["doc_id"], folder_path)
-                except Exception as folder_error:
-                    current_app.logger.error(f"Error setting folder for {result['doc_id']}: {str(folder_error)}")
-                    
-            refresh_file_index_cache()  # Refresh cache after adding content
-            
-            if result["success"]:
-                flash(f"Successfully cached {file_ext[1:].upper()} file '{result['title']}' with {result['chunks']} content chunks!")
-            else:
-                flash(f"Error processing {file_ext[1:].upper()} file: {result.get('error', 'Unknown error')}")
-                return redirect(url_for('file_storage.add_files'))
-        else:
+        process_file = DOCUMENT_HANDLERS.get(file_ext)
+        if process_file is None:
             flash(f"Unsupported file type: {file_ext}. Please upload PDF, TXT, or MD files.")
             return redirect(url_for('file_storage.add_files'))
         
+        result = process_file(file, file.filename, custom_name)
+        
+        # Update metadata with folder information if specified
+        if folder_path and result["success"]:
+            # The PDF processor reports the document ID as "id", the text processor as "doc_id"
+            doc_id = result.get("doc_id", result.get("id"))
+            try:
+                move_item_to_folder(doc_id, folder_path)
+            except Exception as folder_error:
+                current_app.logger.error(f"Error setting folder for {doc_id}: {str(folder_error)}")
+                
+        refresh_file_index_cache()  # Refresh cache after adding content
+        
+        if result["success"]:
+            flash(f"Successfully cached {file_ext[1:].upper()} file '{result['title']}' with {result['chunks']} content chunks!")
+        else:
+            flash(f"Error processing {file_ext[1:].upper()} file: {result.get('error', 'Unknown error')}")
+            return redirect(url_for('file_storage.add_files'))
+        
         return redirect(redirect_url)
         
     except Exception as e:
@@ -104,18 +89,10 @@ def cache_notion_page():
     folder_path = request.form.get('folder_path', '').strip()
     
     # Get pagination parameters to preserve when redirecting
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    filter_title = request.args.get('title', '')
-    filter_type = request.args.get('type', '')
+    params = ListParams.from_request()
     
     # Build redirect URL with parameters - redirect to view_files after adding content
-    redirect_url = url_for("file_storage.view_files", 
-                           page=page, 
-                           per_page=per_page,
-                           title=filter_title,
-                           type=filter_type,
-                           folder=folder_path)
+    redirect_url = params.view_files_url(folder=folder_path)
     
     try:
         notion = get_notion_client()
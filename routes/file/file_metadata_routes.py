@@ -1,19 +1,45 @@
-import os
-import pickle 
-import tempfile
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
-from llama_index.readers.file import PDFReader
-from services.storage_service import get_file_metadata, update_file_metadata, get_storage_client
-from services.utils.metadata import extract_auto_metadata 
-from services.utils.cache import get_folders, move_item_to_folder, refresh_file_index_cache 
-from .route_utils import add_cache_headers 
+import io
+from pypdf import PdfReader
+from flask import Blueprint, request, redirect, url_for, flash, current_app, jsonify
+from services.storage_service import get_file_metadata, update_file_metadata, get_bucket, NAME_LISTING_FIELDS
+from services.utils.metadata import extract_auto_metadata, METADATA_SAMPLE_SIZE
+from services.utils.doc_cache import prefetch_document_texts
+from services.utils.cache import get_folders, move_item_to_folder, refresh_file_index_cache, get_listing_version
+from .route_utils import render_conditional
 
 metadata_bp = Blueprint('file_metadata', __name__, url_prefix='/files/metadata')
 
-@metadata_bp.after_request
-def after_request(response):
-    """Add cache headers after each request"""
-    return add_cache_headers(response)
+# Largest metadata update accepted (title, folder and auto-metadata fields)
+MAX_METADATA_REQUEST_SIZE = 256 * 1024  # 256KB in bytes
+
+# Auto-metadata fields that can be edited by the user
+EDITABLE_AUTO_METADATA_FIELDS = frozenset({
+    'summary', 'language', 'contentType', 'themes', 'topics', 'keywords', 'entities'
+})
+
+def _read_text_content(blob):
+    """Read a text or markdown content file"""
+    # Decode once, invalid bytes don't matter for metadata extraction
+    return blob.download_as_bytes().decode('utf-8', errors='replace')
+
+def _read_pdf_content(blob):
+    """Extract the text of a PDF content file"""
+    try:
+        # Read it straight from memory instead of a temp file on disk
+        reader = PdfReader(io.BytesIO(blob.download_as_bytes()))
+        
+        # Extract text from all pages
+        return "\n\n".join(filter(None, (page.extract_text() for page in reader.pages)))
+    except Exception as e:
+        current_app.logger.warning(f"Error processing PDF: {str(e)}")
+        return ""
+
+# Raw content files tried for metadata generation, in order of preference
+CONTENT_READERS = (
+    ('txt', _read_text_content),
+    ('md', _read_text_content),
+    ('pdf', _read_pdf_content),
+)
 
 @metadata_bp.route("/<path:file_id>")
 def view_metadata(file_id):
@@ -44,8 +70,11 @@ def view_metadata(file_id):
         
         # Get all folders for the folder selection dropdown
         folders = get_folders()
+        
+        # The page only changes with the file metadata and the folder list
+        etag_source = [get_listing_version(), file_id, metadata]
             
-        return render_template('metadata_view.html', 
+        return render_conditional(etag_source, 'metadata_view.html', 
                              metadata=metadata,
                              file_id=file_id,
                              folders=folders)
@@ -59,15 +88,21 @@ def view_metadata(file_id):
 def update_metadata(file_id):
     """Update metadata for a specific file."""
     try:
-        # Get the current metadata first
+        # Check the request before fetching anything from storage
+        if request.content_length and request.content_length > MAX_METADATA_REQUEST_SIZE:
+            return jsonify({"success": False, "error": "Metadata update too large"}), 413
+        
+        # Get the updated metadata from the request
+        request_data = request.get_json(silent=True)
+        if not isinstance(request_data, dict):
+            return jsonify({"success": False, "error": "Invalid metadata update"}), 400
+        
+        # Get the current metadata
         current_metadata = get_file_metadata(file_id)
         
         if not current_metadata:
             return jsonify({"success": False, "error": "No metadata found for this file"})
         
-        # Get the updated metadata from the request
-        request_data = request.json
-        
         # Update only specific fields to avoid losing other metadata
         if 'title' in request_data and request_data['title']:
             current_metadata['title'] = request_data['title']
@@ -79,19 +114,19 @@ def update_metadata(file_id):
             
         # Update auto_metadata fields
         if 'auto_metadata' in request_data:
-            if 'auto_metadata' not in current_metadata:
-                current_metadata['auto_metadata'] = {}
-                
-            for field in ['summary', 'language', 'contentType']:
-                if field in request_data['auto_metadata']:
-                    current_metadata['auto_metadata'][field] = request_data['auto_metadata'][field]
-                    
-            for list_field in ['themes', 'topics', 'keywords', 'entities']:
-                if list_field in request_data['auto_metadata']:
-                    current_metadata['auto_metadata'][list_field] = request_data['auto_metadata'][list_field]
+            requested_auto_metadata = request_data['auto_metadata'] or {}
+            if not isinstance(requested_auto_metadata, dict):
+                return jsonify({"success": False, "error": "Invalid metadata update"}), 400
+            
+            # Copy only the editable fields sent by the client
+            auto_metadata = current_metadata.setdefault('auto_metadata', {})
+            auto_metadata.update(
+                (field, requested_auto_metadata[field])
+                for field in EDITABLE_AUTO_METADATA_FIELDS & requested_auto_metadata.keys()
+            )
             
             # Ensure auto_generated is set
-            current_metadata['auto_metadata']['auto_generated'] = True
+            auto_metadata['auto_generated'] = True
             
         # Save the updated metadata
         success = update_file_metadata(file_id, current_metadata)
@@ -107,7 +142,7 @@ def update_metadata(file_id):
                     # Continue even if folder update failed, the metadata was still updated
             
             # Refresh the file index cache
-            refresh_file_index_cache()
+            refresh_file_index_cache(updated={file_id: current_metadata})
             return jsonify({"success": True})
         else:
             return jsonify({"success": False, "error": "Failed to update metadata"})
@@ -121,95 +156,45 @@ def update_metadata(file_id):
 def generate_metadata(file_id):
     """Generate AI metadata for a specific file."""
     try:
+        # Metadata and document data are stored under the same item ID,
+        # so read the document data while the metadata is downloaded
+        item_id = file_id.replace('cache/', '').replace('.pkl', '')
+        texts_future = prefetch_document_texts(item_id, max_chars=METADATA_SAMPLE_SIZE)
+        
         # Get the current metadata first
         current_metadata = get_file_metadata(file_id)
         
         if not current_metadata:
+            texts_future.cancel()
             return jsonify({"success": False, "error": "No metadata found for this file"})
         
         # Get the file content to analyze
         try:
-            client = get_storage_client()
-            bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-            bucket = client.bucket(bucket_name)
+            bucket = get_bucket()
             
             # Get storage path for the actual file content
             storage_path = current_metadata.get('_storage_path', '')
             if not storage_path:
+                texts_future.cancel()
                 return jsonify({"success": False, "error": "File storage path not found in metadata"})
             
-            # Determine the content blob path based on metadata storage path
-            content_path = None
-            file_content = ""
+            # Documents, PDFs and Notion pages keep their parsed text next to the index
+            file_content = "\n\n".join(texts_future.result())
             
-            # For document files (PDFs, text files, etc.)
-            if "metadata_doc_" in storage_path:
-                doc_id = storage_path.split("metadata_doc_")[1].replace('.pkl', '')
-                content_path = f"cache/document_data_{doc_id}.pkl"
-                
-                # For pickle files, load the document objects
-                try:
-                    blob = bucket.blob(content_path)
-                    if blob.exists():
-                        # Download the pickle file and process it
-                        with blob.open("rb") as f:
-                            documents = pickle.load(f)
-                            
-                        # Extract text from the documents
-                        for doc in documents:
-                            if hasattr(doc, 'text'):
-                                file_content += doc.text + "\n\n"
-                except Exception as e:
-                    current_app.logger.warning(f"Error reading document data pickle: {str(e)}")
-            else:
-                # For other file types, try to infer content path
-                item_id = file_id
-                # Try different possible content paths
-                possible_paths = [
-                    f"cache/content_{item_id}.txt",
-                    f"cache/content_{item_id}.md"
-                ]
-                
-                for path in possible_paths:
-                    blob = bucket.blob(path)
-                    if blob.exists():
-                        content_path = path
-                        try:
-                            file_content = blob.download_as_string().decode('utf-8')
-                        except UnicodeDecodeError:
-                            # Try with a different encoding if utf-8 fails
-                            file_content = blob.download_as_string().decode('latin-1')
-                        break
+            if not file_content:
+                # Fall back to the raw content files, found with one listing request
+                content_prefix = f"cache/content_{item_id}."
+                existing_paths = {
+                    blob.name for blob in bucket.list_blobs(prefix=content_prefix, fields=NAME_LISTING_FIELDS)
+                }
                 
-                # Check for PDF content path
-                pdf_path = f"cache/content_{item_id}.pdf"
-                blob = bucket.blob(pdf_path)
-                if blob.exists() and not file_content:
-                    content_path = pdf_path
-                    
-                    # For PDF, download to temp file and extract text
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                        temp_file_path = temp_file.name
-                        blob.download_to_filename(temp_file_path)
-                    
-                    try:
-                        reader = PDFReader()
-                        documents = reader.load_data(temp_file_path)
-                        
-                        # Extract text from all pages
-                        for doc in documents:
-                            if hasattr(doc, 'text'):
-                                file_content += doc.text + "\n\n"
-                                
-                        # Clean up temp file
-                        os.remove(temp_file_path)
-                    except Exception as e:
-                        current_app.logger.warning(f"Error processing PDF: {str(e)}")
-                        # Clean up temp file on error
-                        try:
-                            os.remove(temp_file_path)
-                        except:
-                            pass
+                # Use the first content file that yields text, in order of preference
+                for extension, read_content in CONTENT_READERS:
+                    path = f"{content_prefix}{extension}"
+                    if path in existing_paths:
+                        file_content = read_content(bucket.blob(path))
+                        if file_content:
+                            break
             
             # Try to extract from metadata if nothing else worked
             if not file_content and "auto_metadata" in current_metadata and "summary" in current_metadata["auto_metadata"]:
@@ -235,8 +220,8 @@ def generate_metadata(file_id):
                 success = update_file_metadata(file_id, current_metadata)
                 
                 if success:
-                    # Refresh the file index cache
-                    refresh_file_index_cache()
+                    # Refresh the file index cache with the metadata just written
+                    refresh_file_index_cache(updated={file_id: current_metadata})
                     return jsonify({
                         "success": True, 
                         "metadata": current_metadata
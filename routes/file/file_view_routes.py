@@ -1,18 +1,19 @@
 import datetime
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, make_response
-from services.utils.cache import get_folders, move_item_to_folder
-from .route_utils import add_cache_headers
-from services.storage_service import delete_file_from_storage
-from services.llm_service import get_available_indexes, refresh_file_index_cache, refresh_file_index_cache,is_cache_loading 
+from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, current_app, jsonify, stream_with_context
+from services.utils.cache import get_folders, move_item_to_folder, get_listing_version
+from services.storage_service import delete_file_from_storage, get_file_metadata
+from services.llm_service import query_available_indexes, refresh_file_index_cache, is_cache_loading
+from .route_utils import ListParams, paginate_indexes, conditional_response, render_conditional
 from services.notion_service import cache_notion_page,cache_notion_database
+from services.jobs import submit_job, get_job_status
 
 
 file_view_bp = Blueprint('file_view', __name__, url_prefix='/files/view')
 
-@file_view_bp.after_request
-def after_request(response):
-    """Add cache headers after each request"""
-    return add_cache_headers(response)
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Body of a failed content table request, static so errors don't render the whole table
+CONTENT_TABLE_ERROR_HTML = '<div class="p-4 text-red-700">Error loading content. Please try again.</div>'
 
 @file_view_bp.route("/delete/<path:file_id>", methods=["POST"])
 def delete_file(file_id):
@@ -20,103 +21,83 @@ def delete_file(file_id):
     
     The path parameter can handle slashes in the file_id.
     """
-    try:
+    # Get current pagination and filter parameters to preserve after redirect
+    params = ListParams.from_request()
     
-        
-        # Get current pagination and filter parameters to preserve after redirect
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        filter_title = request.args.get('title', '')
-        filter_type = request.args.get('type', '')
-        filter_folder = request.args.get('folder', '')
-        
+    try:
         current_app.logger.info(f"Attempting to delete file: {file_id}")
         delete_file_from_storage(file_id)
-        refresh_file_index_cache()  # Refresh cache after deleting content
+        refresh_file_index_cache(removed=[file_id])  # Drop the deleted item from the cache
         flash(f"Cached content {file_id} deleted successfully!")
         
-        # Check if we need to adjust the page number after deletion
-        content_indexes = get_available_indexes(filter_folder if filter_folder else None)
-        if filter_title:
-            content_indexes = [idx for idx in content_indexes if filter_title.lower() in idx['title'].lower()]
-        
-        if filter_type:
-            content_indexes = [idx for idx in content_indexes if idx['type'] == filter_type]
-        
-        # Calculate total pages
-        total_items = len(content_indexes)
-        total_pages = (total_items + per_page - 1) // per_page if total_items > 0 else 1
-        
-        # Adjust page if it's now out of range
-        if page > total_pages and total_pages > 0:
-            page = total_pages
+        # Adjust the page number if it's now out of range
+        _, _, params.page, _ = paginate_indexes(params)
             
     except Exception as e:
         current_app.logger.error(f"Error deleting content: {str(e)}")
         flash(f"Error deleting content: {str(e)}")
     
     # Redirect with pagination and filter parameters preserved
-    return redirect(url_for('file_storage.view_files', 
-                           page=page, 
-                           per_page=per_page,
-                           title=filter_title,
-                           type=filter_type,
-                           folder=filter_folder))
+    return redirect(params.view_files_url())
     
 @file_view_bp.route("/list-cached-content")
 def list_cached_content():
-    """List all cached content."""
+    """
+    List all cached content, as JSON or as NDJSON (one item per line)
+    when the client accepts application/x-ndjson.
+    """
     try:
         folder_path = request.args.get('folder', '')
-        content_indexes = get_available_indexes(folder_path if folder_path else None)
+        title = request.args.get('title', '')
+        index_type = request.args.get('type', '')
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = request.args.get('limit', None, type=int)
+        stream = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
         
-        # Ensure we have a valid list even if get_available_indexes returns None
-        if content_indexes is None:
-            content_indexes = []
+        # Filter and page in the index cache layer, everything in the folder by default.
+        # Queried before building the ETag so a reload of an expired cache is reflected in it
+        content_indexes, total_items = query_available_indexes(folder_path if folder_path else None,
+                                                               title=title,
+                                                               index_type=index_type,
+                                                               offset=offset,
+                                                               limit=limit)
         
-        # Transform content_indexes to include file paths and ids
-        for item in content_indexes:
-            if item is None:
-                continue
+        def build_response():
+            if stream:
+                # Encode the items one at a time instead of building the whole document
+                def generate():
+                    for item in content_indexes:
+                        yield current_app.json.dumps(item) + "\n"
                 
-            # Ensure item has an ID for metadata links
-            if 'id' not in item:
-                item['id'] = item.get('_storage_path', '').replace('cache/', '') or item.get('path', '')
-                
-            # Set display path
-            if '_storage_path' in item:
-                item['display_path'] = item['_storage_path'].replace('cache/', '')
-            elif 'path' in item:
-                item['display_path'] = item['path'].replace('cache/', '')
-        
-        # Filter out any None values that might have slipped through
-        content_indexes = [idx for idx in content_indexes if idx is not None]
+                return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE,
+                                headers={'X-Total-Count': str(total_items)})
+            
+            return jsonify({
+                "cached_items": content_indexes,
+                "total": total_items,
+                "is_loading": False
+            })
         
-        response = make_response(jsonify({
-            "cached_items": content_indexes,
-            "is_loading": False
-        }))
-        return add_cache_headers(response)
+        # The listing only changes with the index cache, and both formats are equivalent
+        etag_source = [get_listing_version(), folder_path, title, index_type, offset, limit, stream]
+        response = conditional_response(etag_source, build_response, weak=True)
+        response.vary.add('Accept')
+        return response
     except Exception as e:
         current_app.logger.error(f"Error listing cached content: {str(e)}")
-        error_response = make_response(jsonify({
+        return jsonify({
             "error": str(e),
             "cached_items": [],  # Return empty list instead of None
             "is_loading": False
-        }), 500)
-        return add_cache_headers(error_response)
+        }), 500
 
 @file_view_bp.route("/refresh-cache", methods=["POST"])
 def refresh_cache():
     """Force a refresh of the file index cache."""
+    # Get current pagination and filter parameters to preserve after redirect
+    params = ListParams.from_request()
+    
     try:
-        # Get current pagination and filter parameters to preserve after redirect
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        filter_title = request.args.get('title', '')
-        filter_type = request.args.get('type', '')
-        filter_folder = request.args.get('folder', '')
-        
         refresh_file_index_cache()  
         flash("Cache refreshed successfully!")
         
@@ -125,22 +106,28 @@ def refresh_cache():
         flash(f"Error refreshing cache: {str(e)}")
     
     # Redirect with pagination and filter parameters preserved
-    return redirect(url_for('file_storage.view_files', 
-                           page=page, 
-                           per_page=per_page,
-                           title=filter_title,
-                           type=filter_type,
-                           folder=filter_folder))
+    return redirect(params.view_files_url())
+
+def _refresh_notion_item(item_type, item_notion_id, custom_name, item_id):
+    """Cache a Notion page or database again, run as a background job"""
+    if item_type == 'page':
+        result = cache_notion_page(item_notion_id, custom_name, item_id)
+        message = f"Successfully refreshed Notion page '{result['title']}' with {result['chunks']} content chunks!"
+    else:
+        result = cache_notion_database(item_notion_id, custom_name, item_id)
+        message = f"Successfully refreshed Notion database '{result['title']}' with {result['pages_found']} pages!"
+    
+    # Update the refreshed item in the cache, its title may have changed in Notion
+    metadata = get_file_metadata(item_id) if item_id else None
+    refresh_file_index_cache(updated={item_id: metadata} if metadata else None)
+    
+    return {"title": result['title'], "message": message}
 
 @file_view_bp.route("/refresh-item", methods=["POST"])
 def refresh_item():
-    """Refresh a single Notion page or database."""
+    """Start refreshing a single Notion page or database in the background."""
     # Get current pagination and filter parameters to preserve when redirecting
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    filter_title = request.args.get('title', '')
-    filter_type = request.args.get('type', '')
-    filter_folder = request.args.get('folder', '')
+    params = ListParams.from_request()
     
     # Get the item_id (UUID used internally) and item_notion_id (actual Notion ID)
     item_id = request.form.get('item_id', '')
@@ -148,40 +135,31 @@ def refresh_item():
     item_type = request.form.get('item_type', '')
     custom_name = request.form.get('custom_name', '')
     
+    job_id = item_id or item_notion_id
+    is_htmx = "HX-Request" in request.headers
     success_message = ""
     error_message = ""
     
     try:
         if not item_notion_id:
             error_message = "No Notion page/database ID provided"
-            flash(error_message)
-            return redirect(url_for('file_storage.view_files'))
-        
-        current_app.logger.info(f"Refreshing {item_type} with ID: {item_notion_id} (UUID: {item_id})")
-        
-        if item_type == 'page':
-            result = cache_notion_page(item_notion_id, custom_name, item_id)
-            success_message = f"Successfully refreshed Notion page '{result['title']}' with {result['chunks']} content chunks!"
-            flash(success_message)
-        elif item_type == 'database':
-            result = cache_notion_database(item_notion_id, custom_name, item_id)
-            success_message = f"Successfully refreshed Notion database '{result['title']}' with {result['pages_found']} pages!"
-            flash(success_message)
-        else:
+        elif item_type not in ('page', 'database'):
             error_message = f"Unknown item type: {item_type}"
-            flash(error_message)
-            return redirect(url_for('file_storage.view_files'))
-        
-        refresh_file_index_cache()  # Refresh cache after updating content
+        else:
+            current_app.logger.info(f"Refreshing {item_type} with ID: {item_notion_id} (UUID: {item_id})")
+            
+            # Fetching and indexing the Notion content takes a while, don't hold the worker for it
+            submit_job(job_id, _refresh_notion_item, item_type, item_notion_id, custom_name, item_id)
+            success_message = f"Refreshing Notion {item_type} '{custom_name or item_notion_id}' in the background"
         
     except Exception as e:
         current_app.logger.error(f"Error refreshing item: {str(e)}")
         error_message = f"Error refreshing item: {str(e)}"
-        flash(error_message)
     
     # Check if this is an HTMX request
-    if "HX-Request" in request.headers:
-        # For HTMX requests, return a notification that can be displayed
+    if is_htmx:
+        # For HTMX requests, return the job to poll for with /check-content-loading,
+        # the page shows its result once it's done
         if error_message:
             return jsonify({
                 "status": "error",
@@ -190,34 +168,27 @@ def refresh_item():
             }), 400
         else:
             return jsonify({
-                "status": "success",
+                "status": "pending",
+                "job_id": job_id,
                 "message": success_message,
                 "title": custom_name or "Item"
-            })
+            }), 202
     
     # For regular requests, redirect with pagination and filter parameters preserved
-    return redirect(url_for('file_storage.view_files', 
-                           page=page, 
-                           per_page=per_page,
-                           title=filter_title,
-                           type=filter_type,
-                           folder=filter_folder))
+    flash(error_message or success_message)
+    return redirect(params.view_files_url())
     
 
 @file_view_bp.route("/move-item", methods=["POST"])
 def move_item():
     """Move an item to a different folder"""
+    # Get current pagination and filter parameters
+    params = ListParams.from_request()
+    
     try:
         item_id = request.form.get('item_id')
         folder_path = request.form.get('folder_path', '')  # Empty string is valid for root folder
         
-        # Get current pagination and filter parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        filter_title = request.args.get('title', '')
-        filter_type = request.args.get('type', '')
-        current_folder = request.args.get('folder', '')
-        
         if not item_id:
             flash("No item ID provided")
             return redirect(url_for('file_storage.view_files'))        # Move the item
@@ -226,157 +197,95 @@ def move_item():
         # Flash success message
         flash(f"Item moved successfully to {'Root' if not folder_path else folder_path}")
         
-        # Force a refresh of the cache to ensure we have the latest data
-        refresh_file_index_cache()
-        
         # For HTMX requests, return the updated content table
         if "HX-Request" in request.headers:
             folders = get_folders()
-            content_indexes = get_available_indexes(current_folder if current_folder else None)
-            
-            # Apply filters
-            if filter_title:
-                content_indexes = [idx for idx in content_indexes if filter_title.lower() in idx['title'].lower()]
-            if filter_type:
-                content_indexes = [idx for idx in content_indexes if idx['type'] == filter_type]
-            
-            # Calculate pagination
-            total_items = len(content_indexes)
-            total_pages = (total_items + per_page - 1) // per_page if total_items > 0 else 1
-            page = min(max(1, page), total_pages)
-            
-            # Get paginated indexes
-            start_idx = (page - 1) * per_page
-            end_idx = start_idx + per_page
-            paginated_indexes = content_indexes[start_idx:end_idx] if total_items > 0 else []
+            paginated_indexes, total_items, page, total_pages = paginate_indexes(params)
             
             return render_template("components/content_table.html", 
                                 content_indexes=paginated_indexes,
                                 total_items=total_items,
                                 page=page,
-                                per_page=per_page,
+                                per_page=params.per_page,
                                 total_pages=total_pages,
-                                filter_title=filter_title,
-                                filter_type=filter_type,
-                                filter_folder=current_folder,
+                                filter_title=params.title,
+                                filter_type=params.type,
+                                filter_folder=params.folder,
                                 folders=folders,
-                                current_folder=current_folder,
+                                current_folder=params.folder,
                                 bucket_name=current_app.config.get('GCS_BUCKET_NAME'),
                                 min=min)
         # For regular requests, redirect to the destination folder
         flash("Item moved successfully!")
-        return redirect(url_for('file_storage.view_files', 
-                              page=1,  # Start at first page in new folder 
-                              per_page=per_page,
-                              title=filter_title,
-                              type=filter_type,
-                              folder=folder_path))  # Redirect to destination folder
+        # Start at first page in the destination folder
+        return redirect(params.view_files_url(page=1, folder=folder_path))
                               
     except Exception as e:
         current_app.logger.error(f"Error moving item: {str(e)}")
         if "HX-Request" in request.headers:
             return jsonify({"error": str(e)}), 500
         flash(f"Error moving item: {str(e)}")
-        return redirect(url_for('file_storage.view_files', 
-                              page=page, 
-                              per_page=per_page,
-                              title=filter_title,
-                              type=filter_type,
-                              folder=current_folder))
+        return redirect(params.view_files_url())
 
 @file_view_bp.route("/filtered-content")
 def filtered_content():
     """Return filtered content for HTMX requests."""
     try:
         # Get pagination parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        filter_title = request.args.get('title', '')
-        filter_type = request.args.get('type', '')
-        filter_folder = request.args.get('folder', '')
+        params = ListParams.from_request()
         
         # Get folders for folder selection in forms
         folders = get_folders()
         
-        # Get content indexes filtered by folder if specified
-        content_indexes = get_available_indexes(filter_folder if filter_folder else None)
-        
-        # Apply title filter if specified
-        if filter_title:
-            content_indexes = [idx for idx in content_indexes if filter_title.lower() in idx['title'].lower()]
+        # Get the requested page of content, filtered by folder, title and type
+        paginated_indexes, total_items, page, total_pages = paginate_indexes(params)
         
-        # Apply type filter if specified
-        if filter_type:
-            content_indexes = [idx for idx in content_indexes if idx['type'] == filter_type]
-        
-        # Calculate total items and pages
-        total_items = len(content_indexes)
-        total_pages = (total_items + per_page - 1) // per_page if total_items > 0 else 1
-        
-        # Ensure page is within valid range
-        if page < 1:
-            page = 1
-        elif page > total_pages and total_pages > 0:
-            page = total_pages
-        
-        # Get paginated indexes
-        paginated_indexes = []
-        if total_items > 0:
-            start_idx = (page - 1) * per_page
-            end_idx = start_idx + per_page
-            paginated_indexes = content_indexes[start_idx:end_idx]
+        # Paging back and forth only re-renders the table when the listing changed
+        bucket_name = current_app.config.get('GCS_BUCKET_NAME')
+        etag_source = [get_listing_version(), bucket_name, page, params.per_page, params.title, params.type, params.folder]
             
         # For HTMX requests, return just the content table component
-        response = make_response(render_template("components/content_table.html", 
-                                            content_indexes=paginated_indexes,
-                                            total_items=total_items,
-                                            page=page,
-                                            per_page=per_page,
-                                            total_pages=total_pages,
-                                            filter_title=filter_title,
-                                            filter_type=filter_type,
-                                            filter_folder=filter_folder,
-                                            folders=folders,
-                                            current_folder=filter_folder,
-                                            bucket_name=current_app.config.get('GCS_BUCKET_NAME'),
-                                            min=min))
-        return add_cache_headers(response)
+        return render_conditional(etag_source, "components/content_table.html", 
+                                  content_indexes=paginated_indexes,
+                                  total_items=total_items,
+                                  page=page,
+                                  per_page=params.per_page,
+                                  total_pages=total_pages,
+                                  filter_title=params.title,
+                                  filter_type=params.type,
+                                  filter_folder=params.folder,
+                                  folders=folders,
+                                  current_folder=params.folder,
+                                  bucket_name=bucket_name,
+                                  min=min)
         
     except Exception as e:
         current_app.logger.error(f"ERROR in filtered_content: {str(e)}")
-        error_response = make_response(render_template("components/content_table.html", 
-                                                   content_indexes=[],
-                                                   total_items=0,
-                                                   page=1,
-                                                   per_page=10,
-                                                   total_pages=1,
-                                                   filter_title='',
-                                                   filter_type='',
-                                                   filter_folder='',
-                                                   folders=[{'path': '', 'name': 'Root'}],
-                                                   current_folder='',
-                                                   bucket_name=current_app.config.get('GCS_BUCKET_NAME'),
-                                                   min=min))
-        return add_cache_headers(error_response)
+        # HTMX doesn't swap error responses, the page keeps its table and shows the error alert
+        return current_app.make_response((CONTENT_TABLE_ERROR_HTML, 500))
     
 
 @file_view_bp.route("/check-content-loading")
 def check_content_loading():
-    """Check if content is still loading."""
+    """Check if content is still loading, and the state of a refresh job when given."""
     try:
         is_loading = is_cache_loading()
+        state = {"is_loading": is_loading}
+        
+        job_id = request.args.get('job_id')
+        if job_id:
+            state["job"] = get_job_status(job_id)
         
-        response = make_response(jsonify({
-            "is_loading": is_loading
-        }))
-        return add_cache_headers(response)
+        # Polled for live state, never reuse an earlier answer
+        response = jsonify(state)
+        response.cache_control.no_store = True
+        return response
     except Exception as e:
         current_app.logger.error(f"Error checking content loading state: {str(e)}")
-        error_response = make_response(jsonify({
+        return jsonify({
             "error": str(e),
             "is_loading": False
-        }), 500)
-        return add_cache_headers(error_response)
+        }), 500
 
 
 @file_view_bp.app_template_filter('timestamp_to_date')
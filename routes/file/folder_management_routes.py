@@ -1,27 +1,19 @@
 from flask import Blueprint, request, redirect, url_for, flash, current_app, jsonify
-from services.utils.cache import get_folders, create_folder, rename_folder, delete_folder,_sync_reload_folder_cache
-from .route_utils import add_cache_headers 
+from services.utils.cache import get_folders, create_folder, rename_folder, delete_folder,_sync_reload_folder_cache, get_listing_version
+from .route_utils import ListParams, conditional_response
 
 folder_bp = Blueprint('folder_management', __name__, url_prefix='/files/folders')
 
-@folder_bp.after_request
-def after_request(response):
-    """Add cache headers after each request"""
-    return add_cache_headers(response)
-
 @folder_bp.route("/create-folder", methods=["POST"])
 def create_folder_route():
     """Create a new folder"""
+    # Get current pagination and filter parameters to preserve after redirect
+    params = ListParams.from_request()
+    
     try:
         folder_name = request.form.get('folder_name', '').strip()
         parent_path = request.form.get('parent_path', '').strip()
         
-        # Get current pagination and filter parameters to preserve after redirect
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        filter_title = request.args.get('title', '')
-        filter_type = request.args.get('type', '')
-        
         if not folder_name:
             flash("Folder name cannot be empty")
         else:
@@ -34,37 +26,25 @@ def create_folder_route():
             
             # If we created a subfolder, return to that parent folder view
             if parent_path:
-                return redirect(url_for('file_storage.view_files', 
-                                      page=page, 
-                                      per_page=per_page,
-                                      title=filter_title,
-                                      type=filter_type,
-                                      folder=parent_path))
+                return redirect(params.view_files_url(folder=parent_path))
     
     except Exception as e:
         current_app.logger.error(f"Error creating folder: {str(e)}")
         flash(f"Error creating folder: {str(e)}")
     
     # Redirect with pagination and filter parameters preserved
-    return redirect(url_for('file_storage.view_files', 
-                           page=page, 
-                           per_page=per_page,
-                           title=filter_title,
-                           type=filter_type))
+    return redirect(params.view_files_url(folder=None))
 
 @folder_bp.route("/rename-folder", methods=["POST"])
 def rename_folder_route():
     """Rename a folder"""
+    # Get current pagination and filter parameters to preserve after redirect
+    params = ListParams.from_request()
+    
     try:
         folder_path = request.form.get('folder_path', '').strip()
         new_name = request.form.get('new_name', '').strip()
         
-        # Get current pagination and filter parameters to preserve after redirect
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        filter_title = request.args.get('title', '')
-        filter_type = request.args.get('type', '')
-        
         if not folder_path or not new_name:
             flash("Folder path and new name are required")
         else:
@@ -76,30 +56,22 @@ def rename_folder_route():
             
             # If renamed folder was in a parent folder, return to parent folder view
             if parent_path:
-                return redirect(url_for('file_storage.view_files', 
-                                      page=page, 
-                                      per_page=per_page,
-                                      title=filter_title,
-                                      type=filter_type,
-                                      folder=parent_path))
+                return redirect(params.view_files_url(folder=parent_path))
     
     except Exception as e:
         current_app.logger.error(f"Error renaming folder: {str(e)}")
         flash(f"Error renaming folder: {str(e)}")
     
     # Redirect with pagination and filter parameters preserved
-    return redirect(url_for('file_storage.view_files', 
-                           page=page, 
-                           per_page=per_page,
-                           title=filter_title,
-                           type=filter_type))
+    return redirect(params.view_files_url(folder=None))
 
 @folder_bp.route("/get-folders", methods=["GET"])
 def get_folders_route():
     """API endpoint to get all folders"""
     try:
         folders = get_folders()
-        return jsonify({"folders": folders})
+        # The folder list only changes when folders are written
+        return conditional_response([get_listing_version()], lambda: jsonify({"folders": folders}), weak=True)
     except Exception as e:
         current_app.logger.error(f"Error getting folders: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -107,15 +79,12 @@ def get_folders_route():
 @folder_bp.route("/delete-folder", methods=["POST"])
 def delete_folder_route():
     """Delete a folder and move all its contents to parent folder"""
+    # Get current pagination and filter parameters to preserve after redirect
+    params = ListParams.from_request()
+    
     try:
         folder_path = request.form.get('folder_path', '').strip()
         
-        # Get current pagination and filter parameters to preserve after redirect
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        filter_title = request.args.get('title', '')
-        filter_type = request.args.get('type', '')
-        
         if not folder_path:
             flash("No folder path provided")
             return redirect(url_for('file_storage.view_files'))
@@ -130,23 +99,14 @@ def delete_folder_route():
         flash(f"Folder '{folder_name}' deleted. {num_affected} items moved to parent folder.")
         
         # Redirect to parent folder or root if deleting a top-level folder
-        return redirect(url_for('file_storage.view_files', 
-                              page=page, 
-                              per_page=per_page,
-                              title=filter_title,
-                              type=filter_type,
-                              folder=parent_path))
+        return redirect(params.view_files_url(folder=parent_path))
     
     except Exception as e:
         current_app.logger.error(f"Error deleting folder: {str(e)}")
         flash(f"Error deleting folder: {str(e)}")
         
         # Redirect with pagination and filter parameters preserved
-        return redirect(url_for('file_storage.view_files', 
-                             page=page, 
-                             per_page=per_page,
-                             title=filter_title,
-                             type=filter_type))
+        return redirect(params.view_files_url(folder=None))
 
 @folder_bp.route('/folders/refresh', methods=['POST'])
 def refresh_folders():
@@ -1,14 +1,137 @@
 """
 Shared utility functions for file routes
 """
+import hashlib
+import json
+from dataclasses import dataclass
+from flask import current_app, render_template, request, session, url_for
+from services.llm_service import query_available_indexes
+
+# Cache control headers added to every response, built once at import
+NO_CACHE_HEADERS = {
+    'Cache-Control': 'no-cache, no-store, must-revalidate',
+    'Pragma': 'no-cache',
+    'Expires': '0'
+}
 
 def add_cache_headers(response):
-    """Add cache control headers to response"""
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
+    """Add cache control headers to the HTML pages and fragments"""
+    # Only HTML is kept out of caches, JSON endpoints stay cacheable.
+    # Leave the responses that set their own caching alone (streams, static files, ETag routes)
+    if response.mimetype == 'text/html' and 'Cache-Control' not in response.headers:
+        response.headers.update(NO_CACHE_HEADERS)
     return response
 
+@dataclass(slots=True)
+class ListParams:
+    """Pagination and filter parameters of the content list, carried through the file routes"""
+    page: int = 1
+    per_page: int = 10
+    title: str = ''
+    type: str = ''
+    folder: str = ''
+
+    @classmethod
+    def from_request(cls):
+        """Read the parameters from the query string"""
+        args = request.args
+        return cls(
+            page=args.get('page', 1, type=int),
+            per_page=args.get('per_page', 10, type=int),
+            title=args.get('title', ''),
+            type=args.get('type', ''),
+            folder=args.get('folder', '')
+        )
+
+    def view_files_url(self, **overrides):
+        """
+        URL of the content list with these parameters.
+        Overrides replace single parameters, None leaves one out.
+        """
+        values = {
+            'page': self.page,
+            'per_page': self.per_page,
+            'title': self.title,
+            'type': self.type,
+            'folder': self.folder
+        }
+        values.update(overrides)
+        return url_for('file_storage.view_files', **values)
+
+def _build_etag(etag_source):
+    """Build an ETag from JSON-serializable data that determines a response"""
+    return hashlib.md5(json.dumps(etag_source, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def conditional_response(etag_source, build_response, weak=False):
+    """
+    Build a response with an ETag from the data it depends on,
+    answering 304 Not Modified without building it when the browser already has this version.
+
+    Args:
+        etag_source: JSON-serializable data that determines the response content
+        build_response (callable): Builds the response body or response when needed
+        weak (bool): Use a weak ETag, for bodies that are equivalent but not byte-identical
+
+    Returns:
+        Response: The built response, or an empty 304 response
+    """
+    etag = _build_etag(etag_source)
+    if_none_match = request.if_none_match
+
+    # Pending flash messages are part of the pages, so they must be built to show them
+    is_current = if_none_match.contains_weak(etag) if weak else if_none_match.contains(etag)
+    if '_flashes' not in session and is_current:
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.make_response(build_response())
+
+    response.set_etag(etag, weak=weak)
+    # Let the browser keep the response but check it with the server on every use
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def render_conditional(etag_source, template_name, **context):
+    """
+    Render a template with an ETag built from the data it depends on,
+    answering 304 Not Modified without rendering when the browser already has this version.
+
+    Args:
+        etag_source: JSON-serializable data that determines the page content
+        template_name (str): The template to render
+        **context: The template context
+
+    Returns:
+        Response: The rendered page, or an empty 304 response
+    """
+    return conditional_response(etag_source, lambda: render_template(template_name, **context))
+
+def paginate_indexes(params):
+    """
+    Get one page of the content list, filtered in the index cache layer.
+    The page number is clamped to the valid range.
+
+    Args:
+        params (ListParams): The folder, title and type filters and the requested page
+
+    Returns:
+        tuple: The items of the page, the total number of matching items, the page number and the number of pages
+    """
+    folder_path = params.folder if params.folder else None
+    per_page = params.per_page
+    page = max(params.page, 1)
+    items, total_items = query_available_indexes(folder_path, title=params.title, index_type=params.type,
+                                                 offset=(page - 1) * per_page, limit=per_page)
+    total_pages = (total_items + per_page - 1) // per_page if total_items > 0 else 1
+
+    # Past the last page (e.g. after a deletion), show the last one instead
+    if page > total_pages:
+        page = total_pages
+        items, total_items = query_available_indexes(folder_path, title=params.title, index_type=params.type,
+                                                     offset=(page - 1) * per_page, limit=per_page)
+
+    return items, total_items, page, total_pages
+
 def send_htmx_response(success, message, content=None):
     """Helper function to send consistent HTMX responses"""
     from flask import jsonify
@@ -1,31 +1,17 @@
 """
 Main routes for the application (home, about)
 """
-from flask import Blueprint, render_template, make_response
+from flask import Blueprint, render_template
 
 # Create a Blueprint for main routes
 main_bp = Blueprint('main', __name__)
 
-def add_cache_headers(response):
-    """Add cache control headers to response"""
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    return response
-
 @main_bp.route('/')
 def home():
     """Render the home page."""
-    response = make_response(render_template('home.html'))
-    return add_cache_headers(response)
+    return render_template('home.html')
 
 @main_bp.route('/about')
 def about():
     """Render the about page."""
-    response = make_response(render_template('about.html'))
-    return add_cache_headers(response)
-
-@main_bp.after_request
-def after_request(response):
-    """Add cache headers after each request"""
-    return add_cache_headers(response)
\ No newline at end of file
+    return render_template('about.html')
\ No newline at end of file
@@ -10,6 +10,8 @@ from services.document_service import process_pdf_file, process_text_file
 from services.llm_service import *
 from services.notion_service import *
 from services.storage_service import *
+# Named explicitly since they are re-exported in __all__
+from services.storage_service import get_storage_client, get_bucket
 
 # Import extract_auto_metadata from the new path
 from .utils.metadata import extract_auto_metadata
@@ -21,5 +23,6 @@ __all__ = [
     'process_pdf_file',
     'process_text_file',
     # Other services
-    'get_storage_client'
+    'get_storage_client',
+    'get_bucket'
 ]
\ No newline at end of file
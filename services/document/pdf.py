@@ -11,9 +11,12 @@ from flask import current_app
 from llama_index.core import VectorStoreIndex
 from llama_index.core.node_parser.text.token import TokenTextSplitter
 from llama_index.readers.file import PDFReader
-from services.storage_service import generate_uuid, get_storage_client
+from services.storage_service import generate_uuid, get_bucket
 from services.utils.metadata import extract_auto_metadata
 
+# Shared reader, it keeps no state between files (each load opens its own pypdf reader)
+pdf_reader = PDFReader()
+
 def process_pdf_file(file_stream, filename, custom_name=None):
     """Process a PDF file and cache it for LLM processing"""
     try:
@@ -28,20 +31,22 @@ def process_pdf_file(file_stream, filename, custom_name=None):
             
         try:
             # Extract text from PDF
-            reader = PDFReader()
-            documents = reader.load_data(temp_file_path)
+            documents = pdf_reader.load_data(temp_file_path)
             current_app.logger.info(f"Loaded {len(documents)} pages from PDF")
             
             # Combine text for metadata extraction
-            combined_text = ""
+            text_parts = []
+            text_length = 0
             text_limit = 5000  # Limit text for metadata extraction to first 5000 characters
             
-            if len(documents) > 0:
-                for doc in documents:
-                    if hasattr(doc, 'text'):
-                        combined_text += doc.text + "\n\n"
-                        if len(combined_text) >= text_limit:
-                            break
+            for doc in documents:
+                if hasattr(doc, 'text'):
+                    text_parts.append(doc.text)
+                    text_parts.append("\n\n")
+                    text_length += len(doc.text) + 2
+                    if text_length >= text_limit:
+                        break
+            combined_text = "".join(text_parts)
             
             # Get file title
             if custom_name and custom_name.strip():
@@ -58,9 +63,7 @@ def process_pdf_file(file_stream, filename, custom_name=None):
             
             # Get GCS client and bucket
             current_app.logger.info("Getting storage client")
-            client = get_storage_client()
-            bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-            bucket = client.bucket(bucket_name)
+            bucket = get_bucket()
             
             # Store metadata
             metadata = {
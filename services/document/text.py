@@ -3,14 +3,18 @@ Service for processing text documents (txt, md, etc.)
 """
 import os
 import io
+import codecs
 import pickle
 import time
 from flask import current_app
 from llama_index.core import Document, VectorStoreIndex
 from llama_index.core.node_parser.text.token import TokenTextSplitter
-from services.storage_service import generate_uuid, get_storage_client
+from services.storage_service import generate_uuid, get_bucket
 from services.utils.metadata import extract_auto_metadata
 
+# Size of the blocks read from the uploaded file
+READ_BLOCK_SIZE = 64 * 1024  # 64KB
+
 def process_text_file(file_stream, filename, custom_name=None):
     """Process a text file (txt, md) and cache it for LLM processing"""
     start_time = time.time()
@@ -31,9 +35,17 @@ def process_text_file(file_stream, filename, custom_name=None):
         doc_title = custom_name.strip() if custom_name and custom_name.strip() else os.path.basename(filename)
         current_app.logger.info(f"Using document title: {doc_title}")
         
-        # Read file content
+        # Read file content in blocks, decoding as we go instead of holding the raw bytes and the text at once
         file_stream.seek(0)
-        text_content = file_stream.read().decode('utf-8', errors='replace')
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        text_parts = []
+        file_size = 0
+        for block in iter(lambda: file_stream.read(READ_BLOCK_SIZE), b''):
+            file_size += len(block)
+            text_parts.append(decoder.decode(block))
+        text_parts.append(decoder.decode(b'', final=True))
+        text_content = "".join(text_parts)
+        del text_parts
         
         # Create Document object
         document = Document(text=text_content, metadata={"filename": filename, "title": doc_title})
@@ -44,9 +56,7 @@ def process_text_file(file_stream, filename, custom_name=None):
         
         # Get GCS client and bucket
         current_app.logger.info("Getting storage client")
-        client = get_storage_client()
-        bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-        bucket = client.bucket(bucket_name)
+        bucket = get_bucket()
         
         # Store metadata with document title
         metadata = {
@@ -56,7 +66,7 @@ def process_text_file(file_stream, filename, custom_name=None):
             'type': 'document',
             'format': format_type,
             'filename': filename,
-            'file_size_bytes': len(text_content),
+            'file_size_bytes': file_size,
             'created_at': time.time(),
             'auto_metadata': auto_metadata
         }
@@ -113,7 +123,7 @@ def process_text_file(file_stream, filename, custom_name=None):
             }
         
         elapsed_time = time.time() - start_time
-        current_app.logger.info(f"Successfully cached document '{doc_title}' to GCS bucket {bucket_name} in {elapsed_time:.2f} seconds")
+        current_app.logger.info(f"Successfully cached document '{doc_title}' to GCS bucket {bucket.name} in {elapsed_time:.2f} seconds")
         
         return {
             "success": True,
@@ -0,0 +1,104 @@
+"""
+Background jobs for slow work started from a request, such as Notion refreshes
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
+from flask import current_app
+
+# Shared pool for background jobs, created on first use
+_executor = None
+_executor_lock = threading.Lock()
+JOB_WORKERS = 4
+
+# Jobs still pending or running, by job ID
+_jobs = {}
+# Finished jobs, kept until their status is read or they expire
+_finished_jobs = TTLCache(maxsize=256, ttl=600)
+# Guards both dicts, TTLCache is not thread-safe
+_jobs_lock = threading.Lock()
+
+def _get_executor():
+    """Get the shared background job pool"""
+    global _executor
+    if _executor is not None:
+        return _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="jobs")
+
+    return _executor
+
+def _run_in_app_context(app, func, args, kwargs):
+    """Run a job from a pool thread"""
+    with app.app_context():
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            app.logger.error(f"Background job {func.__name__} failed: {str(e)}")
+            raise
+
+def submit_job(job_id, func, *args, **kwargs):
+    """
+    Run a function in the background pool, inside the current app context.
+    A job still running under the same ID is reused instead of starting another one.
+
+    Args:
+        job_id (str): The job ID, such as the ID of the item being refreshed
+        func (callable): The function to run
+        *args: Positional arguments for the function
+        **kwargs: Keyword arguments for the function
+
+    Returns:
+        concurrent.futures.Future: The future of the job
+    """
+    app = current_app._get_current_object()
+
+    with _jobs_lock:
+        future = _jobs.get(job_id)
+        if future is not None and not future.done():
+            return future
+
+        future = _get_executor().submit(_run_in_app_context, app, func, args, kwargs)
+        _jobs[job_id] = future
+        _finished_jobs.pop(job_id, None)
+
+    # Added outside the lock, the callback runs right away if the job already finished
+    future.add_done_callback(lambda done: _job_finished(job_id, done))
+    return future
+
+def _job_finished(job_id, future):
+    """Move a finished job out of the running jobs, its result is kept until read"""
+    with _jobs_lock:
+        if _jobs.get(job_id) is future:
+            del _jobs[job_id]
+            _finished_jobs[job_id] = future
+
+def get_job_status(job_id):
+    """
+    Get the state of the latest job started under an ID.
+    A finished job is forgotten once its status has been returned.
+
+    Args:
+        job_id (str): The job ID
+
+    Returns:
+        dict: The job status, with the result or the error once finished
+    """
+    with _jobs_lock:
+        future = _jobs.get(job_id)
+        if future is None:
+            future = _finished_jobs.pop(job_id, None)
+
+    if future is None:
+        return {"status": "unknown"}
+    if not future.done():
+        return {"status": "running" if future.running() else "pending"}
+    if future.cancelled():
+        return {"status": "error", "error": "Job cancelled"}
+
+    error = future.exception()
+    if error is not None:
+        return {"status": "error", "error": str(error)}
+    return {"status": "success", "result": future.result()}
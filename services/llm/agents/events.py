@@ -15,4 +15,7 @@ class RewriteEvent(Event):
     review: str
 
 class WriteEvent(Event):
-    pass
\ No newline at end of file
+    pass
+
+class ProgressEvent(Event):
+    msg: str
\ No newline at end of file
@@ -2,12 +2,17 @@
 Simple instruction parser using LLM to detect requirements in prompts.
 """
 import logging
+import re
 from services.llm.agents.utils import llm
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("InstructionParser")
 
+# Patterns for the analysis answer lines, compiled once
+WORD_COUNT_RE = re.compile(r"WORD_COUNT:[ \t]*(\d+)[ \t\r]*$", re.MULTILINE)
+CONTEXT_RE = re.compile(r"CONTEXT:([^\n]*)")
+
 def analyze_prompt_requirements(prompt: str) -> dict:
     """
     Uses the LLM to detect word count requirements and context preservation needs in any language.
@@ -41,22 +46,13 @@ def analyze_prompt_requirements(prompt: str) -> dict:
         result = {}
         
         # Parse the simple response format
-        if "WORD_COUNT:" in response:
-            try:
-                word_count_line = [line for line in response.split('\n') if "WORD_COUNT:" in line][0]
-                count = word_count_line.split("WORD_COUNT:")[1].strip()
-                if count.isdigit():
-                    result["word_count_instruction"] = f"Ensure the answer is exactly {count} words long."
-            except:
-                pass
+        word_count_match = WORD_COUNT_RE.search(response)
+        if word_count_match:
+            result["word_count_instruction"] = f"Ensure the answer is exactly {word_count_match.group(1)} words long."
                 
-        if "CONTEXT:" in response:
-            try:
-                context_line = [line for line in response.split('\n') if "CONTEXT:" in line][0]
-                context = context_line.split("CONTEXT:")[1].strip()
-                result["context_instruction"] = f"Ensure the answer preserves this context: {context}"
-            except:
-                pass
+        context_match = CONTEXT_RE.search(response)
+        if context_match:
+            result["context_instruction"] = f"Ensure the answer preserves this context: {context_match.group(1).strip()}"
                 
         return result
         
@@ -1,3 +1,4 @@
+import asyncio
 import traceback
 import logging
 from llama_index.core.workflow import Context
@@ -8,6 +9,7 @@ from llama_index.core.workflow import (
     step,
 )
 from services.llm.agents.events import (
+    ProgressEvent,
     QueryEvent,
     ReviewEvent,
     WriteEvent,
@@ -54,6 +56,7 @@ class MainAgentWorflow(Workflow):
     @step
     async def query(self, ctx: Context, ev: QueryEvent) -> ReviewEvent:
         logger.info("====== QUERY STEP STARTED ======")
+        ctx.write_event_to_stream(ProgressEvent(msg="Searching for information..."))
         try:
             await ctx.set("prompt", ev.prompt)
             # Get available indexes from context if provided in the event
@@ -78,12 +81,20 @@ class MainAgentWorflow(Workflow):
             query_prompt += "Just include the facts without making it into a full answer. " + \
                 f"Use these index IDs for searching: {index_ids}"
             
+            # The prompt requirements don't depend on the research, analyze them
+            # in a worker thread while the query agent is running
+            requirements_future = asyncio.get_running_loop().run_in_executor(
+                None, analyze_prompt_requirements, ev.prompt
+            )
+            
             logger.info("Sending query to query agent...")
+            # Awaited so other agent requests on the shared loop keep running during the LLM calls.
             # Adjust the query to include index_ids in a format the agent can understand
-            result = self.query_agent.chat(query_prompt)
+            result = await self.query_agent.achat(query_prompt)
             
             logger.info(f"Research result received (first 100 chars): {str(result)[:100]}...")
             await ctx.set("research", str(result))
+            await ctx.set("requirements", await requirements_future)
             logger.info("====== QUERY STEP COMPLETED ======")
             
             # Now we go directly to the review step instead of write
@@ -100,6 +111,7 @@ class MainAgentWorflow(Workflow):
     @step
     async def review(self, ctx: Context, ev: ReviewEvent) -> WriteEvent | StopEvent:
         logger.info("====== REVIEW STEP STARTED ======")
+        ctx.write_event_to_stream(ProgressEvent(msg="Reviewing..."))
         try:
             original_prompt = await ctx.get("prompt")
             research_info = await ctx.get("research")
@@ -110,8 +122,8 @@ class MainAgentWorflow(Workflow):
             if is_pre_write:
                 logger.info("This is a PRE-WRITE review to guide the writing process")
                 
-                # Get all requirements in one simple call (no await as it's not async)
-                requirements = analyze_prompt_requirements(original_prompt)
+                # Requirements were analyzed alongside the research
+                requirements = await ctx.get("requirements", {})
                 word_count_instruction = requirements.get('word_count_instruction')
                 context_instruction = requirements.get('context_instruction')
                 
@@ -134,7 +146,7 @@ class MainAgentWorflow(Workflow):
                 DO NOT waste time describing what is correct - focus only on problems that need fixing.
                 """
                 
-                result = self.review_agent.chat(review_prompt)
+                result = await self.review_agent.achat(review_prompt)
                 logger.info(f"Pre-writing review result received: {str(result)[:100]}...")
                 
                 # Check if the review agent is providing a direct answer
@@ -160,8 +172,8 @@ class MainAgentWorflow(Workflow):
                 # Log the current rewrite count for debugging
                 logger.info(f"Current rewrite count: {rewrite_count}")
                 
-                # Get all requirements
-                requirements = analyze_prompt_requirements(original_prompt)
+                # Reuse the requirements instead of analyzing the prompt again on every review
+                requirements = await ctx.get("requirements", {})
                 word_count_instruction = requirements.get('word_count_instruction')
                 context_instruction = requirements.get('context_instruction')
                 
@@ -182,7 +194,7 @@ class MainAgentWorflow(Workflow):
                 DO NOT provide a comprehensive evaluation if the content is already acceptable.
                 """
                 
-                result = self.review_agent.chat(review_prompt)
+                result = await self.review_agent.achat(review_prompt)
                 logger.info(f"Post-write review result received: {str(result)}")
                 
                 # Check if we've already hit the max rewrite count
@@ -192,7 +204,7 @@ class MainAgentWorflow(Workflow):
                 
                 logger.info("Asking if we should retry based on the review...")
                 
-                try_again = llm.complete(
+                try_again = await llm.acomplete(
                     f"This is a review of an answer. If you think this review is bad enough "
                     f"that it should be rewritten, respond with just the word RETRY. If the review is good, reply "
                     f"with just the word CONTINUE. Here's the review: <review>{str(result)}</review>"
@@ -214,6 +226,7 @@ class MainAgentWorflow(Workflow):
     @step
     async def write(self, ctx: Context, ev: WriteEvent) -> ReviewEvent:
         logger.info("====== WRITE STEP STARTED ======")
+        ctx.write_event_to_stream(ProgressEvent(msg="Writing the answer..."))
         try:
             original_prompt = await ctx.get("prompt")
             research_info = await ctx.get("research")
@@ -250,7 +263,7 @@ class MainAgentWorflow(Workflow):
                 logger.info("Including conversation history in write prompt")
             
             logger.info("Sending prompt to write agent...")
-            result = self.write_agent.chat(prompt)
+            result = await self.write_agent.achat(prompt)
             
             logger.info(f"Write result received (first 100 chars): {str(result)[:100]}...")
             logger.info("====== WRITE STEP COMPLETED ======")
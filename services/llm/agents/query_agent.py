@@ -1,4 +1,6 @@
 import os
+import asyncio
+import logging
 from llama_index.core.agent import FunctionCallingAgent as GenericFunctionCallingAgent
 from llama_index.core.tools import FunctionTool
 from services.llm.agents.utils import llm
@@ -6,13 +8,18 @@ from tavily import AsyncTavilyClient
 from dotenv import load_dotenv
 from services.llm.content import get_content_metadata
 from services.notion_service import download_blob_to_memory
-from services.storage_service import get_storage_client
+from services.storage_service import get_bucket
 
 # Load environment variables from .env file
 load_dotenv()
 
 tavily_api_key = os.getenv("TAVILY_API_KEY") 
 
+logger = logging.getLogger("QueryAgent")
+
+# Auto-metadata fields holding lists of terms, matched against the query
+METADATA_TERM_FIELDS = ('keywords', 'themes', 'topics', 'entities')
+
 
 async def search_best_maching_index_based_on_metdata(
     query: str,
@@ -26,25 +33,30 @@ async def search_best_maching_index_based_on_metdata(
         index_ids: List of index IDs to search through
     """
     if not index_ids:
-        print("ERROR: No index IDs provided")
+        logger.error("No index IDs provided")
         return {"error": "No index IDs provided"}
     
     matches = []
-    query_terms = set(query.lower().split())
-    print(f"[METADATA SEARCH] Query terms: {query_terms}")
-    print(f"[METADATA SEARCH] Processing {len(index_ids)} index IDs")
+    # Normalize the query once, it is matched against every index
+    query_lower = query.lower()
+    query_words = query_lower.split()
+    query_terms = frozenset(query_words)
+    # Consecutive 3-word phrases of the query, for the partial phrase matches
+    query_phrases = tuple(' '.join(query_words[i:i+3]) for i in range(len(query_words) - 2)) if len(query_terms) >= 3 else ()
+    logger.debug("[METADATA SEARCH] Query terms: %s", query_terms)
+    logger.info("[METADATA SEARCH] Processing %s index IDs", len(index_ids))
     
     # Get available metadata indexes of the list of indexes
     for index_id in index_ids:
         try:
-            print(f"[METADATA SEARCH] Fetching metadata for index: {index_id}")
-            # The get_content_metadata function is not async, so we shouldn't await it
-            metadata = get_content_metadata(index_id)
-            print(f"[METADATA SEARCH] Metadata type: {type(metadata)}")
-            print(f"[METADATA SEARCH] Metadata content: {metadata}")
+            logger.debug("[METADATA SEARCH] Fetching metadata for index: %s", index_id)
+            # The metadata download is blocking, run it off the event loop
+            metadata = await asyncio.to_thread(get_content_metadata, index_id)
+            logger.debug("[METADATA SEARCH] Metadata type: %s", type(metadata))
+            logger.debug("[METADATA SEARCH] Metadata content: %s", metadata)
             
             if not metadata:
-                print(f"[METADATA SEARCH] WARNING: No metadata found for index: {index_id}")
+                logger.warning("[METADATA SEARCH] No metadata found for index: %s", index_id)
                 continue
                 
             # Extract key fields from metadata and create a focused search text
@@ -66,7 +78,7 @@ async def search_best_maching_index_based_on_metdata(
                         important_fields.append(summary.lower())
                     
                     # Add keywords, themes, topics
-                    for field in ['keywords', 'themes', 'topics', 'entities']:
+                    for field in METADATA_TERM_FIELDS:
                         values = auto_meta.get(field, [])
                         if values:
                             if isinstance(values, list):
@@ -85,25 +97,18 @@ async def search_best_maching_index_based_on_metdata(
             else:
                 meta_text = str(metadata).lower()
             
-            print(f"[METADATA SEARCH] Processed metadata text length: {len(meta_text)}")
-            print(f"[METADATA SEARCH] Extracted fields: {important_fields[:3]}...")
+            logger.debug("[METADATA SEARCH] Processed metadata text length: %s", len(meta_text))
+            logger.debug("[METADATA SEARCH] Extracted fields: %s...", important_fields[:3])
             
             # Calculate a more sophisticated relevance score
             # Count how many query terms appear in the metadata
             matched_terms = sum(1 for term in query_terms if term in meta_text)
             
             # Check for exact matches of the complete query
-            exact_match = query.lower() in meta_text
+            exact_match = query_lower in meta_text
             
             # Also check for partial phrase matches (at least 3 consecutive words)
-            phrase_match = False
-            if len(query_terms) >= 3:
-                query_words = query.lower().split()
-                for i in range(len(query_words) - 2):  # Need at least 3 words
-                    phrase = ' '.join(query_words[i:i+3])
-                    if phrase in meta_text:
-                        phrase_match = True
-                        break
+            phrase_match = any(phrase in meta_text for phrase in query_phrases)
             
             # Calculate a weighted score with bonuses for different match types
             score = matched_terms  # Base score from matched terms
@@ -121,7 +126,7 @@ async def search_best_maching_index_based_on_metdata(
                 coverage_bonus = int(coverage * 5)  # Up to 5 points based on coverage
                 score += coverage_bonus
             
-            print(f"[METADATA SEARCH] Match score for {index_id}: {score} (matched terms: {matched_terms}, exact match: {exact_match}, phrase match: {phrase_match})")
+            logger.debug("[METADATA SEARCH] Match score for %s: %s (matched terms: %s, exact match: %s, phrase match: %s)", index_id, score, matched_terms, exact_match, phrase_match)
             
             # Only include matches with a minimum score
             if score > 0:
@@ -132,7 +137,7 @@ async def search_best_maching_index_based_on_metdata(
                     "matched_fields": important_fields[:5]  # Include matched fields for debugging
                 })
         except Exception as e:
-            print(f"[METADATA SEARCH] ERROR processing index {index_id}: {str(e)}")
+            logger.error("[METADATA SEARCH] Error processing index %s: %s", index_id, e)
             continue
 
     # Sort matches by score (highest first)
@@ -152,6 +157,66 @@ async def search_best_maching_index_based_on_metdata(
     return {"error": "No matching metadata found", "matches": 0}
     
     
+def _search_index_context(query: str, index_id: str):
+    """Query a single vector index, returning its result or None if it doesn't exist"""
+    try:
+        logger.debug("[CONTEXT SEARCH] Processing index: %s", index_id)
+        # Get search results directly from the vector index
+        bucket = get_bucket()
+        
+        # Path to the vector index
+        vector_index_path = f"cache/vector_index_{index_id}.pkl"
+        logger.debug("[CONTEXT SEARCH] Looking for vector index at: %s", vector_index_path)
+        
+        # Try to load the existing vector index
+        if not bucket.blob(vector_index_path).exists():
+            logger.debug("[CONTEXT SEARCH] Vector index not found for %s", index_id)
+            return None
+        
+        logger.debug("[CONTEXT SEARCH] Vector index found for %s", index_id)
+        # Load the vector index
+        index = download_blob_to_memory(vector_index_path)
+        if not index:
+            logger.debug("[CONTEXT SEARCH] Failed to load vector index for %s", index_id)
+            return None
+            
+        logger.debug("[CONTEXT SEARCH] Creating query engine for %s", index_id)
+        # Create a query engine with similarity search
+        query_engine = index.as_query_engine(similarity_top_k=5)
+        
+        logger.debug("[CONTEXT SEARCH] Executing query against %s", index_id)
+        # Get the response with similarity scores
+        response = query_engine.query(query)
+        
+        # Extract the text and similarity scores from the source nodes
+        result_text = str(response)
+        logger.debug("[CONTEXT SEARCH] Got response for %s, length: %s", index_id, len(result_text))
+        
+        # Extract similarity scores from source nodes if available
+        similarity_score = 0.0
+        source_nodes = getattr(response, 'source_nodes', [])
+        if source_nodes and len(source_nodes) > 0:
+            # Get the highest similarity score from the source nodes
+            similarity_score = max((node.score or 0.0) for node in source_nodes)
+            logger.debug("[CONTEXT SEARCH] Found %s source nodes for %s, best score: %s", len(source_nodes), index_id, similarity_score)
+        else:
+            # Fallback if no source nodes or scores
+            similarity_score = min(len(result_text) / 1000, 1.0)  # Normalize by length, max 1.0
+            logger.debug("[CONTEXT SEARCH] No source nodes for %s, using fallback score: %s", index_id, similarity_score)
+        
+        return {
+            "index_id": index_id,
+            "content": result_text,
+            "relevance_score": similarity_score,
+            "similarity": float(similarity_score)
+        }
+    except Exception as e:
+        logger.error("[CONTEXT SEARCH] Error processing index %s: %s", index_id, e)
+        return {
+            "index_id": index_id,
+            "error": str(e)
+        }
+
 async def search_best_context(
     query: str,
     index_ids: list = None,
@@ -167,84 +232,28 @@ async def search_best_context(
     # Handle case where the complete result from first function is passed
     if isinstance(index_ids, dict) and "top_match_ids" in index_ids:
         index_ids = index_ids.get("top_match_ids")
-        print(f"[CONTEXT SEARCH] Extracted top_match_ids from dictionary: {index_ids}")
+        logger.debug("[CONTEXT SEARCH] Extracted top_match_ids from dictionary: %s", index_ids)
         
     if not index_ids:
         return {"error": "No index IDs provided for context search"}
     
-    print(f"[CONTEXT SEARCH] Starting context search for query: '{query}'")
-    print(f"[CONTEXT SEARCH] Searching through {len(index_ids)} indexes: {index_ids}")
-    
-    results = []
+    logger.info("[CONTEXT SEARCH] Starting context search for query: '%s'", query)
+    logger.info("[CONTEXT SEARCH] Searching through %s indexes: %s", len(index_ids), index_ids)
     
-    for index_id in index_ids:
-        try:
-            print(f"[CONTEXT SEARCH] Processing index: {index_id}")
-            # Get search results directly from the vector index
-            client = get_storage_client()
-            bucket_name = os.getenv("GCS_BUCKET_NAME") or os.environ.get('GCS_BUCKET_NAME')
-            bucket = client.bucket(bucket_name)
-            
-            # Path to the vector index
-            vector_index_path = f"cache/vector_index_{index_id}.pkl"
-            print(f"[CONTEXT SEARCH] Looking for vector index at: {vector_index_path}")
-            
-            # Try to load the existing vector index
-            if bucket.blob(vector_index_path).exists():
-                print(f"[CONTEXT SEARCH] Vector index found for {index_id}")
-                # Load the vector index
-                index = download_blob_to_memory(vector_index_path)
-                if not index:
-                    print(f"[CONTEXT SEARCH] Failed to load vector index for {index_id}")
-                    continue
-                    
-                print(f"[CONTEXT SEARCH] Creating query engine for {index_id}")
-                # Create a query engine with similarity search
-                query_engine = index.as_query_engine(similarity_top_k=5)
-                
-                print(f"[CONTEXT SEARCH] Executing query against {index_id}")
-                # Get the response with similarity scores
-                response = query_engine.query(query)
-                
-                # Extract the text and similarity scores from the source nodes
-                result_text = str(response)
-                print(f"[CONTEXT SEARCH] Got response for {index_id}, length: {len(result_text)}")
-                
-                # Extract similarity scores from source nodes if available
-                similarity_score = 0.0
-                source_nodes = getattr(response, 'source_nodes', [])
-                if source_nodes and len(source_nodes) > 0:
-                    # Get the highest similarity score from the source nodes
-                    similarity_score = max((node.score or 0.0) for node in source_nodes)
-                    print(f"[CONTEXT SEARCH] Found {len(source_nodes)} source nodes for {index_id}, best score: {similarity_score}")
-                else:
-                    # Fallback if no source nodes or scores
-                    similarity_score = min(len(result_text) / 1000, 1.0)  # Normalize by length, max 1.0
-                    print(f"[CONTEXT SEARCH] No source nodes for {index_id}, using fallback score: {similarity_score}")
-                
-                results.append({
-                    "index_id": index_id,
-                    "content": result_text,
-                    "relevance_score": similarity_score,
-                    "similarity": float(similarity_score)
-                })
-            else:
-                print(f"[CONTEXT SEARCH] Vector index not found for {index_id}")
-        except Exception as e:
-            print(f"[CONTEXT SEARCH] ERROR processing index {index_id}: {str(e)}")
-            results.append({
-                "index_id": index_id,
-                "error": str(e)
-            })
+    # Search every index concurrently, each one loads its vector index and queries it
+    results = await asyncio.gather(
+        *(asyncio.to_thread(_search_index_context, query, index_id) for index_id in index_ids)
+    )
+    results = [result for result in results if result is not None]
     
     # Sort results by relevance score
     results.sort(key=lambda x: x.get("relevance_score", 0), reverse=True)
-    print(f"[CONTEXT SEARCH] Found {len(results)} results, sorted by relevance")
+    logger.info("[CONTEXT SEARCH] Found %s results, sorted by relevance", len(results))
     
     if results:
         # Take the 5 best results (or fewer if less available)
         top_results = results[:5]
-        print(f"[CONTEXT SEARCH] Returning top {len(top_results)} results")
+        logger.info("[CONTEXT SEARCH] Returning top %s results", len(top_results))
         return {
             "best_result": results[0] if results else None,
             "top_results": top_results,  # Include top 5 results with similarity scores
@@ -252,7 +261,7 @@ async def search_best_context(
             "total_results": len(results)
         }
     
-    print("[CONTEXT SEARCH] No relevant context found in any index")
+    logger.info("[CONTEXT SEARCH] No relevant context found in any index")
     return {"error": "No relevant context found in the provided indexes"}
     
 async def search_web(
@@ -261,34 +270,34 @@ async def search_web(
     """Search the web for information.
     Use this as a LAST RESORT only if the information cannot be found in our indexes."""
     
-    print(f"[WEB SEARCH] Searching web for query: '{query}'")
+    logger.info("[WEB SEARCH] Searching web for query: '%s'", query)
     
     try:
         client = AsyncTavilyClient(api_key=tavily_api_key)
         if not tavily_api_key:
-            print("[WEB SEARCH] ERROR: No Tavily API key found")
+            logger.error("[WEB SEARCH] No Tavily API key found")
             return {"error": "No Tavily API key configured"}
             
-        print("[WEB SEARCH] Sending request to Tavily API")
+        logger.debug("[WEB SEARCH] Sending request to Tavily API")
         search_results = await client.search(query)
         
         # Check if we got valid results
         if not search_results:
-            print("[WEB SEARCH] No results returned from Tavily API")
+            logger.debug("[WEB SEARCH] No results returned from Tavily API")
             return {"error": "No web search results found"}
             
         result_count = len(search_results) if isinstance(search_results, list) else "N/A"
-        print(f"[WEB SEARCH] Received {result_count} results from Tavily API")
+        logger.info("[WEB SEARCH] Received %s results from Tavily API", result_count)
         
         # Convert to string for returning to agent
         str_results = str(search_results)
-        print(f"[WEB SEARCH] Result length: {len(str_results)} characters")
+        logger.debug("[WEB SEARCH] Result length: %s characters", len(str_results))
         
         return str_results
         
     except Exception as e:
         error_msg = str(e)
-        print(f"[WEB SEARCH] ERROR during web search: {error_msg}")
+        logger.error("[WEB SEARCH] Error during web search: %s", error_msg)
         return {"error": f"Web search failed: {error_msg}"}
 
 
@@ -303,36 +312,36 @@ async def analyze_query_need_for_search(query: str, conversation_history: list =
     Returns:
         Dictionary with analysis result
     """
-    print(f"[ANALYZE QUERY] Analyzing query: '{query}'")
+    logger.info("[ANALYZE QUERY] Analyzing query: '%s'", query)
     
     # If no conversation history, search is needed
     if not conversation_history or len(conversation_history) == 0:
-        print("[ANALYZE QUERY] No conversation history available - search needed")
+        logger.debug("[ANALYZE QUERY] No conversation history available - search needed")
         return {
             "needs_search": True,
             "reason": "No conversation history available to answer the query"
         }
     
-    print(f"[ANALYZE QUERY] Found conversation history with {conversation_history} messages")
+    logger.debug("[ANALYZE QUERY] Found conversation history with %s messages", len(conversation_history))
   
     # Format conversation history for the LLM
-    history_text = ""
-    processed_messages = 0
+    history_lines = []
     
     for msg in conversation_history:
         # Check if msg is a dict with 'role' and 'content' keys
         if isinstance(msg, dict) and 'role' in msg and 'content' in msg:
-            history_text += f"{msg['role']}: {msg['content']}\n"
-            processed_messages += 1
+            history_lines.append(f"{msg['role']}: {msg['content']}\n")
         # Otherwise check if it has roles and content attributes
         elif hasattr(msg, 'roles') and hasattr(msg, 'content'):
-            history_text += f"{msg.roles}: {msg.content}\n"
-            processed_messages += 1
+            history_lines.append(f"{msg.roles}: {msg.content}\n")
         else:
-            print(f"[ANALYZE QUERY] WARNING: Message format not recognized: {type(msg)}")
+            logger.warning("[ANALYZE QUERY] Message format not recognized: %s", type(msg))
+    
+    history_text = "".join(history_lines)
+    processed_messages = len(history_lines)
                 
-    print(f"[ANALYZE QUERY] Successfully processed {processed_messages} messages for history")
-    print(f"[ANALYZE QUERY] Total history length: {history_text} characters")
+    logger.debug("[ANALYZE QUERY] Successfully processed %s messages for history", processed_messages)
+    logger.debug("[ANALYZE QUERY] Total history length: %s characters", len(history_text))
     
     # Ask LLM if the history contains enough information to answer
     analysis_prompt = f"""Based on the conversation history below, determine if you can answer the user's query 
@@ -347,26 +356,26 @@ async def analyze_query_need_for_search(query: str, conversation_history: list =
     Answer with YES or NO, followed by a brief explanation.
     """
     
-    print(f"[ANALYZE QUERY] Sending LLM analysis prompt with {len(history_text)} chars of history")
-    response = llm.complete(analysis_prompt)
+    logger.debug("[ANALYZE QUERY] Sending LLM analysis prompt with %s chars of history", len(history_text))
+    response = await llm.acomplete(analysis_prompt)
     answer = response.text.strip()
-    print(f"[ANALYZE QUERY] Received LLM response of {len(answer)} chars")
-    print(f"[ANALYZE QUERY] Analysis result: {answer}")
+    logger.debug("[ANALYZE QUERY] Received LLM response of %s chars", len(answer))
+    logger.debug("[ANALYZE QUERY] Analysis result: %s", answer)
     
     # Parse response
     needs_search = True
     if answer.startswith("YES"):
         needs_search = False
-        print("[ANALYZE QUERY] LLM determined we CAN answer from history (needs_search=False)")
+        logger.info("[ANALYZE QUERY] LLM determined we CAN answer from history (needs_search=False)")
     else:
-        print("[ANALYZE QUERY] LLM determined we CANNOT answer from history (needs_search=True)")
+        logger.info("[ANALYZE QUERY] LLM determined we CANNOT answer from history (needs_search=True)")
     
     result = {
         "needs_search": needs_search,
         "reason": answer,
         "history_available": True
     }
-    print(f"[ANALYZE QUERY] Returning result: {result}")
+    logger.debug("[ANALYZE QUERY] Returning result: %s", result)
     return result
     
 # Convert functions to FunctionTool objects
@@ -1,10 +1,17 @@
 import os
 from llama_index.llms.openai import OpenAI
 from dotenv import load_dotenv
+from services.utils.http_client import get_http_client, get_async_http_client
 
 
 load_dotenv()
 
 api_key = os.getenv("OPENAI_API_KEY") 
 
-llm = OpenAI(model="gpt-4o-mini", api_key=api_key)
+# Share the connection pools with the chat LLM instead of opening new connections per agent call
+llm = OpenAI(
+    model="gpt-4o-mini",
+    api_key=api_key,
+    http_client=get_http_client(),
+    async_http_client=get_async_http_client()
+)
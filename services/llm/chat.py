@@ -3,7 +3,7 @@ LLM chat interaction functionality using LlamaIndex
 """
 import json
 import os
-import traceback
+from functools import lru_cache
 from flask import current_app
 from llama_index.core.llms import ChatMessage, MessageRole
 from llama_index.llms.openai import OpenAI
@@ -11,10 +11,26 @@ from llama_index.core import Settings
 from services.llm.agents.review_agent import review_agent
 from services.llm.agents.write_agent import write_agent
 from services.llm.agents.main_agent_worflow import MainAgentWorflow
+from services.llm.agents.events import ProgressEvent
 from services.llm.agents.query_agent import query_agent
 from services.llm.content import query_content
- 
-def get_query_response_full(message,lstMessageHistory,temperature,maxTokens,useRag,mode,listOfIndexes):
+from services.utils.http_client import get_http_client
+
+@lru_cache(maxsize=32)
+def get_chat_llm(temperature, maxTokens, api_key):
+    """
+    Get the OpenAI LLM for a temperature and token limit.
+    Instances are reused across requests instead of being rebuilt for every query.
+    """
+    return OpenAI(
+        model="gpt-4o-mini",
+        temperature=temperature,
+        max_tokens=maxTokens,
+        api_key=api_key,
+        http_client=get_http_client()
+    )
+
+def get_query_response_full(message,lstMessageHistory,temperature,maxTokens,useRag,mode,listOfIndexes,stream=False):
     """
     Get a streaming response from the LLM using the provided parameters.
     
@@ -26,6 +42,7 @@ def get_query_response_full(message,lstMessageHistory,temperature,maxTokens,useR
         useRag (bool): Whether to use RAG for context
         mode (str): Mode of operation (e.g., "chat")
         listOfIndexes (list): List of index IDs to use for context
+        stream (bool): Whether to yield the response token by token as the LLM produces it
         
     Yields:
         str: Chunks of the response text if streaming, or the complete response if not streaming
@@ -37,13 +54,8 @@ def get_query_response_full(message,lstMessageHistory,temperature,maxTokens,useR
             yield "Error: OpenAI API key not configured"
             return
         
-        # Initialize the OpenAI LLM
-        llm = OpenAI(
-            model="gpt-4o-mini",
-            temperature=temperature,
-            max_tokens=maxTokens,
-            api_key=api_key
-        )
+        # Get the OpenAI LLM for these settings
+        llm = get_chat_llm(temperature, maxTokens, api_key)
         # Set LlamaIndex settings
         Settings.llm = llm
           # Remove duplicate index IDs to prevent multiple loading of the same index
@@ -91,9 +103,14 @@ def get_query_response_full(message,lstMessageHistory,temperature,maxTokens,useR
         # Add the current user message
         messages.append(ChatMessage(role=MessageRole.USER, content=message))
 
-        response = llm.chat(messages)
-
-        yield response.message.content
+        if stream:
+            # Forward each token as soon as the LLM produces it
+            for chunk in llm.stream_chat(messages):
+                if chunk.delta:
+                    yield chunk.delta
+        else:
+            response = llm.chat(messages)
+            yield response.message.content
             
     except Exception as e:
         current_app.logger.error(f"Error in chat response: {str(e)}")
@@ -142,23 +159,33 @@ def getContext(query, listOfIndexes):
     return ""
 
 
-async def get_agent_response_full(message,lstMessageHistory,temperature,modules,maxTokens,useRag,mode,listOfIndexes):
+async def get_agent_response_full(message,lstMessageHistory,temperature,modules,maxTokens,useRag,mode,listOfIndexes,on_progress=None):
+    """
+    Run the agent workflow on a query.
+    
+    Args:
+        on_progress (callable, optional): Called with a short message each time the workflow starts a step
+        
+    Returns:
+        str: The final answer, or a dict with an error message if the workflow failed
+    """
     current_app.logger.info("=" * 50)
     current_app.logger.info("AGENT WORKFLOW EXECUTION STARTED")
     current_app.logger.info("=" * 50)
-    current_app.logger.info(f"Message: {message[:100]}...")
-    current_app.logger.info(f"Parameters: temperature={temperature}, modules={modules}, maxTokens={maxTokens}, useRag={useRag}, mode={mode}")
-    current_app.logger.info(f"Message history received: {len(lstMessageHistory) if lstMessageHistory else 0} messages")
+    current_app.logger.info("Message: %.100s...", message)
+    current_app.logger.info("Parameters: temperature=%s, modules=%s, maxTokens=%s, useRag=%s, mode=%s",
+                            temperature, modules, maxTokens, useRag, mode)
+    current_app.logger.info("Message history received: %d messages", len(lstMessageHistory) if lstMessageHistory else 0)
     
     # Verify agent availability
-    current_app.logger.info(f"Query Agent available: {query_agent is not None}")
-    current_app.logger.info(f"Write Agent available: {write_agent is not None}")
-    current_app.logger.info(f"Review Agent available: {review_agent is not None}")
+    current_app.logger.debug("Query Agent available: %s", query_agent is not None)
+    current_app.logger.debug("Write Agent available: %s", write_agent is not None)
+    current_app.logger.debug("Review Agent available: %s", review_agent is not None)
 
     # Remove duplicate index IDs to prevent multiple loading of the same index
     if listOfIndexes:
         listOfIndexes = list(set(listOfIndexes))
-        current_app.logger.info(f"Using unique index IDs in agent response: {listOfIndexes}")
+        current_app.logger.info("Using unique index IDs in agent response: %s", listOfIndexes)
     else:
         current_app.logger.info("No indexes provided for context retrieval")
         
@@ -182,7 +209,7 @@ async def get_agent_response_full(message,lstMessageHistory,temperature,modules,
                     current_app.logger.warning(f"Could not parse message history item: {msg_str}")
                     continue
             
-            current_app.logger.info(f"Formatted {len(formatted_history)} messages from history")
+            current_app.logger.info("Formatted %d messages from history", len(formatted_history))
         except Exception as e:
             current_app.logger.error(f"Error processing message history: {str(e)}")
             formatted_history = []
@@ -194,7 +221,7 @@ async def get_agent_response_full(message,lstMessageHistory,temperature,modules,
         current_app.logger.info("Starting workflow execution...")
         current_app.logger.info("Passing agents to workflow: QueryAgent, WriteAgent, ReviewAgent")
         
-        handler = await workflow.run(
+        handler = workflow.run(
             prompt=message,
             query_agent=query_agent,
             write_agent=write_agent,
@@ -202,17 +229,24 @@ async def get_agent_response_full(message,lstMessageHistory,temperature,modules,
             index_ids=listOfIndexes,
             message_history=formatted_history,
         )
+        
+        # Report the steps as the workflow goes through them
+        if on_progress is not None:
+            async for event in handler.stream_events():
+                if isinstance(event, ProgressEvent):
+                    on_progress(event.msg)
+        
+        handler = await handler
 
         current_app.logger.info("Workflow execution completed")
-        current_app.logger.info(f"Result type: {type(handler)}")
+        current_app.logger.debug("Result type: %s", type(handler))
         
         final_result = handler
         current_app.logger.info("==== The report ====")
-        current_app.logger.info(f"Result: {str(final_result)[:100]}...")
+        current_app.logger.info("Result: %.100s...", final_result)
         current_app.logger.info("=" * 50)
         
         return final_result
     except Exception as e:
-        print(f"Error in agent workflow: {str(e)}")
-        print(traceback.format_exc())
+        current_app.logger.exception("Error in agent workflow: %s", e)
         return {"error": str(e)}
\ No newline at end of file
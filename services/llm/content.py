@@ -1,25 +1,17 @@
 """
 Content retrieval and querying functionality for LLM services
 """
-import os
 from flask import current_app
 from typing import List, Dict, Any
 from services.notion_service import download_blob_to_memory
 from services.utils.cache import get_available_indexes 
-from services.storage_service import get_storage_client, get_file_metadata
+from services.storage_service import get_bucket, get_file_metadata
 
 def _ensure_bucket_exists():
     """Ensure the GCS bucket exists and is accessible."""
     try:
-        client = get_storage_client()
-        bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-        if not bucket_name:
-            raise ValueError("GCS_BUCKET_NAME environment variable or config not set")
-            
-        bucket = client.bucket(bucket_name)
-        if not bucket.exists():
-            current_app.logger.info(f"Creating bucket {bucket_name}")
-            bucket.create()
+        # The bucket itself is checked once when the storage client is created
+        bucket = get_bucket()
             
         # Create the cache directory structure if it doesn't exist
         cache_blob = bucket.blob('cache/')
@@ -68,9 +60,7 @@ def query_content(query: str, index_ids: List[str] = None, use_metadata_filterin
                 current_app.logger.info(f"Querying content with ID: {clean_id}")
                 
                 # Try all possible vector index paths for this ID
-                client = get_storage_client()
-                bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-                bucket = client.bucket(bucket_name)
+                bucket = get_bucket()
                 
                 # Check if blobs exist before attempting to download
                 vector_paths = []
@@ -0,0 +1,56 @@
+"""
+Exact-match cache for LLM responses
+"""
+import hashlib
+import json
+import threading
+from cachetools import TTLCache
+
+class LLMCache:
+    """In-process cache of complete LLM responses keyed by a hash of the request parameters"""
+
+    def __init__(self, maxsize=4096, ttl=3600):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # TTLCache is not thread-safe and requests are served by several threads
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(**params):
+        """Build a stable cache key from the request parameters"""
+        payload = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Get a cached response, None on a miss"""
+        with self._lock:
+            return self._cache.get(key)
+
+    def set(self, key, response):
+        """Store a complete response"""
+        with self._lock:
+            self._cache[key] = response
+
+# Shared cache for the chat responses
+llm_cache = LLMCache()
+
+def is_cacheable(temperature):
+    """Only responses generated with temperature 0 are deterministic enough to reuse"""
+    try:
+        return float(temperature) == 0
+    except (TypeError, ValueError):
+        return False
+
+def cache_response_chunks(response_generator, cache_key):
+    """
+    Pass the response chunks through and store the complete response once generated.
+    Error responses are not cached.
+    """
+    chunks = []
+    for chunk in response_generator:
+        if chunk:
+            chunks.append(chunk)
+        yield chunk
+
+    response = "".join(chunks)
+    if response and not response.startswith("Error"):
+        llm_cache.set(cache_key, response)
@@ -0,0 +1,102 @@
+"""
+Semantic cache for LLM responses, matching paraphrased questions by embedding similarity
+"""
+import os
+import time
+import threading
+import numpy as np
+from flask import current_app
+from llama_index.embeddings.openai import OpenAIEmbedding
+from services.utils.http_client import get_http_client
+
+# Minimum cosine similarity for two questions to be considered the same
+SIMILARITY_THRESHOLD = 0.95
+# Number of questions kept per scope and how long their answers stay valid
+MAX_ENTRIES = 1024
+ENTRY_TTL = 3600  # seconds
+
+class SemanticCache:
+    """
+    In-process cache of LLM responses looked up by question similarity.
+    Entries are grouped by scope (the request parameters other than the question),
+    so an answer is only reused for the same settings, history and indexes.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, max_entries=MAX_ENTRIES, ttl=ENTRY_TTL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._embed_model = None
+        # scope -> {'vectors': np.ndarray, 'responses': list, 'timestamps': list}
+        self._scopes = {}
+        self._lock = threading.Lock()
+
+    def _get_embed_model(self):
+        """Create the embedding model on first use"""
+        if self._embed_model is None:
+            self._embed_model = OpenAIEmbedding(
+                model="text-embedding-3-small",
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=get_http_client()
+            )
+        return self._embed_model
+
+    def embed(self, text):
+        """Embed a question as a normalized vector"""
+        vector = np.asarray(self._get_embed_model().get_text_embedding(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, scope, vector):
+        """Get the response of the most similar cached question, None if none is close enough"""
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if not entries or not entries['responses']:
+                return None
+
+            # Vectors are normalized, so the dot product is the cosine similarity
+            similarities = entries['vectors'] @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            if time.time() - entries['timestamps'][best] > self.ttl:
+                return None
+            return entries['responses'][best]
+
+    def set(self, scope, vector, response):
+        """Store the response to a question"""
+        with self._lock:
+            entries = self._scopes.setdefault(scope, {
+                'vectors': np.empty((0, vector.shape[0]), dtype=np.float32),
+                'responses': [],
+                'timestamps': []
+            })
+            entries['vectors'] = np.vstack([entries['vectors'], vector])[-self.max_entries:]
+            entries['responses'] = (entries['responses'] + [response])[-self.max_entries:]
+            entries['timestamps'] = (entries['timestamps'] + [time.time()])[-self.max_entries:]
+
+# Shared semantic cache for the chat responses
+semantic_cache = SemanticCache()
+
+def embed_question(message):
+    """Embed a question for the semantic cache, None if the embedding failed"""
+    try:
+        return semantic_cache.embed(message)
+    except Exception as e:
+        current_app.logger.warning(f"Could not embed question for the semantic cache: {str(e)}")
+        return None
+
+def cache_semantic_response_chunks(response_generator, scope, vector):
+    """
+    Pass the response chunks through and store the complete response once generated.
+    Error responses are not cached.
+    """
+    chunks = []
+    for chunk in response_generator:
+        if chunk:
+            chunks.append(chunk)
+        yield chunk
+
+    response = "".join(chunks)
+    if response and not response.startswith("Error"):
+        semantic_cache.set(scope, vector, response)
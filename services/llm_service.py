@@ -10,35 +10,35 @@ from services.llm import (
     query_content,
     get_content_metadata,
 )
-from services.utils.cache import get_available_indexes as get_indexes 
-
-# Add a global flag to track loading state
-_cache_loading = False
-
-def is_cache_loading():
-    """Check if the cache is currently being loaded or refreshed."""
-    global _cache_loading
-    return _cache_loading
+from services.utils.cache import (
+    get_available_indexes as get_indexes,
+    query_available_indexes as query_indexes,
+    is_cache_loading,
+)
 
 def get_available_indexes(folder_path=None):
     """Get all available cached content indexes."""
-    global _cache_loading
-    if _cache_loading:
-        # If already loading, return empty list to prevent duplicate loading
-        return []
     try:
-        _cache_loading = True
+        # Concurrent misses share one reload in the cache layer, reads of a warm cache don't wait
         indexes = get_indexes(folder_path)
         return indexes if indexes is not None else []
     except Exception as e:
         current_app.logger.error(f"Error in llm_service.get_available_indexes: {str(e)}")
         return []
-    finally:
-        _cache_loading = False
+
+def query_available_indexes(folder_path=None, *, title=None, index_type=None, offset=0, limit=None):
+    """Get one page of the cached content indexes matching the filters, with the total count."""
+    try:
+        return query_indexes(folder_path, title=title, index_type=index_type, offset=offset, limit=limit)
+    except Exception as e:
+        current_app.logger.error(f"Error in llm_service.query_available_indexes: {str(e)}")
+        return [], 0
 
 __all__ = [
     'refresh_file_index_cache',
     'get_available_indexes',
+    'query_available_indexes',
+    'is_cache_loading',
     'query_content',
     'get_content_metadata'
 ]
\ No newline at end of file
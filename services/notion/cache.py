@@ -9,7 +9,7 @@ from flask import current_app
 from llama_index.readers.notion import NotionPageReader
 from llama_index.core import VectorStoreIndex
 from llama_index.core.node_parser.text.token import TokenTextSplitter
-from services.storage_service import generate_uuid, get_storage_client
+from services.storage_service import generate_uuid, get_bucket
 from services.utils.metadata import extract_auto_metadata
 from services.notion.utils import get_notion_client, extract_notion_page_title, extract_notion_content_as_text, download_blob_to_memory
 
@@ -59,9 +59,7 @@ def cache_notion_page(page_id, custom_name=None, item_uuid=generate_uuid()):
         
         # Get GCS client and bucket
         current_app.logger.info(f"Getting storage client")
-        client = get_storage_client()
-        bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-        bucket = client.bucket(bucket_name)
+        bucket = get_bucket()
         
         # Store metadata with page title
         metadata = {
@@ -124,7 +122,7 @@ def cache_notion_page(page_id, custom_name=None, item_uuid=generate_uuid()):
             vector_index_blob.upload_from_file(file_buffer)
         
         elapsed_time = time.time() - start_time
-        current_app.logger.info(f"Successfully cached Notion page '{page_title}' to GCS bucket {bucket_name} in {elapsed_time:.2f} seconds")
+        current_app.logger.info(f"Successfully cached Notion page '{page_title}' to GCS bucket {bucket.name} in {elapsed_time:.2f} seconds")
         return {
             "success": True,
             "notion_id": page_id,
@@ -141,8 +139,11 @@ def cache_notion_page(page_id, custom_name=None, item_uuid=generate_uuid()):
         current_app.logger.error(f"Error caching Notion page after {elapsed_time:.2f} seconds: {str(e)}")
         raise
 
-def cache_notion_database(database_id, custom_name=None):
-    """Cache all pages in a Notion database to Google Cloud Storage bucket as a single unified index."""
+def cache_notion_database(database_id, custom_name=None, item_uuid=None):
+    """
+    Cache all pages in a Notion database to Google Cloud Storage bucket as a single unified index.
+    A refresh passes the UUID of the cached database so its files are replaced instead of duplicated.
+    """
     start_time = time.time()
     try:
         current_app.logger.info(f"Starting to cache Notion database {database_id}")
@@ -225,12 +226,10 @@ def cache_notion_database(database_id, custom_name=None):
         
         # Get GCS client and bucket
         current_app.logger.info(f"Getting storage client")
-        client = get_storage_client()
-        bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-        bucket = client.bucket(bucket_name)
+        bucket = get_bucket()
         
-        # Generate a single UUID for this database
-        item_id = generate_uuid()
+        # Reuse the UUID of the database being refreshed, or generate a single one for a new database
+        item_id = item_uuid or generate_uuid()
         
         # Store metadata with database title
         metadata = {
@@ -287,7 +286,7 @@ def cache_notion_database(database_id, custom_name=None):
             all_index_blob.upload_from_file(file_buffer)
         
         elapsed_time = time.time() - start_time
-        current_app.logger.info(f"Successfully cached Notion database '{database_title}' with {len(page_ids)} pages to GCS bucket {bucket_name} in {elapsed_time:.2f} seconds")
+        current_app.logger.info(f"Successfully cached Notion database '{database_title}' with {len(page_ids)} pages to GCS bucket {bucket.name} in {elapsed_time:.2f} seconds")
         
         return {
             "success": True,
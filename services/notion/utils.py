@@ -72,11 +72,13 @@ def extract_notion_content_as_text(documents):
     """Extract text content from Notion documents for metadata analysis."""
     combined_text = ""
     try:
+        text_parts = []
         for doc in documents:
             if hasattr(doc, 'text'):
-                combined_text += doc.text + "\n\n"
+                text_parts.append(doc.text)
             elif hasattr(doc, 'get_content'):
-                combined_text += doc.get_content() + "\n\n"
+                text_parts.append(doc.get_content())
+        combined_text = "".join(f"{text}\n\n" for text in text_parts)
         
         # Limit the text to a reasonable size for processing
         if len(combined_text) > 10000:
@@ -89,23 +91,18 @@ def extract_notion_content_as_text(documents):
 
 def download_blob_to_memory(blob_name):
     """Download a blob from GCS to memory."""
-    from services.storage_service import get_storage_client
+    from services.storage_service import get_bucket
     
     max_retries = 3
     retry_delay = 1  # seconds
     
     for attempt in range(max_retries):
         try:
-            client = get_storage_client()
-            bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-            if not bucket_name:
-                raise ValueError("GCS_BUCKET_NAME environment variable or config not set")
-                
-            bucket = client.bucket(bucket_name)
+            bucket = get_bucket()
             blob = bucket.blob(blob_name)
 
             if not blob.exists():
-                raise FileNotFoundError(f"Blob {blob_name} does not exist in bucket {bucket_name}")
+                raise FileNotFoundError(f"Blob {blob_name} does not exist in bucket {bucket.name}")
             
             with io.BytesIO() as file_buffer:
                 blob.download_to_file(file_buffer)
@@ -113,7 +110,7 @@ def download_blob_to_memory(blob_name):
                 return pickle.load(file_buffer)
                 
         except FileNotFoundError:
-            current_app.logger.error(f"Blob {blob_name} not found in bucket {bucket_name}")
+            current_app.logger.error(f"Blob {blob_name} not found in bucket {bucket.name}")
             raise
         except Exception as e:
             if attempt < max_retries - 1:
@@ -4,74 +4,108 @@ Storage service for handling Google Cloud Storage operations
 import uuid
 from flask import current_app
 from google.cloud import storage
+from google.api_core.exceptions import NotFound
 import os
 import io
 import pickle
+import threading
+
+# Chunk size for resumable uploads (must be a multiple of 256 KB)
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Field projections for blob listings, so GCS doesn't return ACLs, hashes, etc.
+FILE_LISTING_FIELDS = "items(name,size,updated,contentType),nextPageToken"
+NAME_LISTING_FIELDS = "items(name),nextPageToken"
+
+# Shared storage client, created on first use and reused by every request
+_storage_client = None
+_bucket = None
+_storage_client_lock = threading.Lock()
 
 def get_storage_client():
-    """Get a Google Cloud Storage client."""
-    try:
-        # First try using Application Default Credentials
-        client = storage.Client()
-        
-        # Ensure the bucket exists and we can access it
-        bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-        if not bucket_name:
-            raise ValueError("GCS_BUCKET_NAME environment variable or config not set")
-            
-        bucket = client.bucket(bucket_name)
-        if not bucket.exists():
-            current_app.logger.info(f"Creating bucket {bucket_name}")
-            bucket.create()
-            
-        return client
-    except Exception as e:
-        current_app.logger.error(f"Error initializing storage client: {str(e)}")
-        raise
+    """Get the shared Google Cloud Storage client."""
+    global _storage_client, _bucket
+    if _storage_client is not None:
+        return _storage_client
+    
+    with _storage_client_lock:
+        if _storage_client is None:
+            try:
+                # First try using Application Default Credentials
+                client = storage.Client()
+                
+                # Ensure the bucket exists and we can access it (only once per process)
+                bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
+                if not bucket_name:
+                    raise ValueError("GCS_BUCKET_NAME environment variable or config not set")
+                    
+                bucket = client.bucket(bucket_name)
+                if not bucket.exists():
+                    current_app.logger.info(f"Creating bucket {bucket_name}")
+                    bucket.create()
+                    
+                _bucket = bucket
+                _storage_client = client
+            except Exception as e:
+                current_app.logger.error(f"Error initializing storage client: {str(e)}")
+                raise
+    
+    return _storage_client
+
+def get_bucket():
+    """
+    Get the application's storage bucket.
+    The bucket name is read once, when the shared client is created.
+    """
+    get_storage_client()
+    return _bucket
 
 def generate_uuid():
     """Generate a new unique uuid"""
     return str(uuid.uuid4())
 
 def get_all_files():
-    """Get a list of all files in the storage bucket."""
-    client = get_storage_client()
-    bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-    bucket = client.bucket(bucket_name)
+    """
+    Iterate over all files in the storage bucket.
     
-    # List all blobs/files in the bucket
-    blobs = list(bucket.list_blobs())
+    Yields:
+        dict: The name, size, update time and content type of each file
+    """
+    bucket = get_bucket()
+    
+    # Only fetch the fields we use, page by page as the caller consumes them
+    blobs = bucket.list_blobs(fields=FILE_LISTING_FIELDS, page_size=1000)
     
     # Get file details
-    files = []
     for blob in blobs:
-        files.append({
+        yield {
             'name': blob.name,
             'size': blob.size,
             'updated': blob.updated,
             'content_type': blob.content_type
-        })
-        
-    return files
+        }
 
 def upload_file_to_storage(file):
     """Upload a file to the storage bucket."""
-    client = get_storage_client()
-    bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-    bucket = client.bucket(bucket_name)
+    bucket = get_bucket()
     
-    # Create a blob and upload the file
-    blob = bucket.blob(file.filename)
-    blob.upload_from_file(file)
+    # Werkzeug spools large uploads to a temporary file, so measure the size
+    # from the stream instead of reading it into memory
+    stream = file.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    
+    # Create a blob and upload the file as a resumable upload in fixed-size chunks
+    blob = bucket.blob(file.filename, chunk_size=UPLOAD_CHUNK_SIZE)
+    blob.upload_from_file(stream, size=size, content_type=file.mimetype)
     
     return True
 
 def delete_file_from_storage(file_id):
     """Delete all related files associated with an index ID."""
     try:
-        client = get_storage_client()
-        bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-        bucket = client.bucket(bucket_name)
+        bucket = get_bucket()
         
         current_app.logger.info(f"Attempting to delete content with ID: {file_id}")
         
@@ -90,7 +124,7 @@ def delete_file_from_storage(file_id):
             if "*" in pattern:
                 prefix = pattern.split("*")[0]
                 # List all blobs with the prefix
-                blobs = list(bucket.list_blobs(prefix=prefix))
+                blobs = list(bucket.list_blobs(prefix=prefix, fields=NAME_LISTING_FIELDS))
                 for blob in blobs:
                     try:
                         blob.delete()
@@ -138,9 +172,7 @@ def get_file_metadata(file_id):
         dict: The file metadata or None if not found
     """
     try:
-        client = get_storage_client()
-        bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-        bucket = client.bucket(bucket_name)
+        bucket = get_bucket()
         
         # Clean up the file_id by removing any cache/ or .pkl suffix
         clean_id = file_id.replace('cache/', '').replace('.pkl', '')
@@ -154,14 +186,13 @@ def get_file_metadata(file_id):
         found_path = None
         
         for path in metadata_paths:
-            blob = bucket.blob(path)
-            if blob.exists():
-                found_path = path
-                with io.BytesIO() as file_buffer:
-                    blob.download_to_file(file_buffer)
-                    file_buffer.seek(0)
-                    metadata = pickle.load(file_buffer)
-                break
+            # Download directly, a missing blob costs the same single request as an exists() check
+            try:
+                metadata = pickle.loads(bucket.blob(path).download_as_bytes())
+            except NotFound:
+                continue
+            found_path = path
+            break
                 
         if metadata:
             # Add the blob path to the metadata
@@ -203,9 +234,7 @@ def update_file_metadata(file_id, updated_metadata):
             del updated_metadata['_storage_path']
             
         # Save updated metadata back to the same location
-        client = get_storage_client()
-        bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-        bucket = client.bucket(bucket_name)
+        bucket = get_bucket()
         blob = bucket.blob(storage_path)
         
         with io.BytesIO() as file_buffer:
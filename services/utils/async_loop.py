@@ -0,0 +1,68 @@
+"""
+Shared asyncio event loop for running coroutines from synchronous request handlers
+"""
+import asyncio
+import concurrent.futures
+import threading
+from flask import current_app
+
+# One event loop per worker process, running in a background thread
+_loop = None
+_loop_lock = threading.Lock()
+
+def get_event_loop():
+    """
+    Get the shared background event loop, starting it on first use.
+    The loop is started lazily so that each forked Gunicorn worker gets its own.
+    """
+    global _loop
+    if _loop is not None:
+        return _loop
+
+    with _loop_lock:
+        if _loop is None:
+            # The agent steps await their LLM calls, so the workflows of
+            # concurrent requests run side by side on this one loop
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="async-loop", daemon=True)
+            thread.start()
+            _loop = loop
+
+    return _loop
+
+async def _run_in_app_context(app, coro):
+    """Await a coroutine with the Flask application context pushed"""
+    with app.app_context():
+        return await coro
+
+def submit_async(coro):
+    """
+    Schedule a coroutine on the shared event loop without waiting for it.
+
+    Args:
+        coro: The coroutine to run
+
+    Returns:
+        concurrent.futures.Future: The future holding the value returned by the coroutine
+    """
+    app = current_app._get_current_object()
+    return asyncio.run_coroutine_threadsafe(_run_in_app_context(app, coro), get_event_loop())
+
+def run_async(coro, timeout=None):
+    """
+    Run a coroutine on the shared event loop and wait for its result.
+
+    Args:
+        coro: The coroutine to run
+        timeout (float, optional): Maximum number of seconds to wait for the result
+
+    Returns:
+        The value returned by the coroutine
+    """
+    future = submit_async(coro)
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        # Don't leave the coroutine running on the shared loop once nobody waits for it
+        future.cancel()
+        raise
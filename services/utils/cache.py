@@ -3,15 +3,25 @@ Cache management for LLM service components
 """
 import io
 import os
+import hashlib
 import time
 import logging
 import pickle
 import json
+import threading
+from itertools import islice
 from flask import current_app
-from typing import Dict, Any
-from services.storage_service import get_storage_client
+from google.api_core.exceptions import NotFound
+from typing import Dict
+from services.storage_service import get_bucket, NAME_LISTING_FIELDS
 from services.notion_service import download_blob_to_memory
 
+# Redis is optional: without it the index listing is read from storage every time
+try:
+    import redis
+except ImportError:
+    redis = None
+
 
 # Configure logging for background tasks that can't access Flask's logger
 background_logger = logging.getLogger('background_cache')
@@ -21,18 +31,45 @@ if not background_logger.handlers:
     background_logger.addHandler(handler)
     background_logger.setLevel(logging.INFO)
 
-# Cache storage for file indexes
-_file_index_cache = {
-    'data': None,
-    'timestamp': 0,
-    'is_loading': False
-}
 CACHE_TTL = 60  # Cache time-to-live in seconds
 
+# Shared Redis cache for the index listing (enabled by setting REDIS_URL)
+INDEXES_CACHE_KEY = "indexes:v3"
+_redis_client = None
+
+# Per-process copy of the index listing, checked before Redis and storage.
+# The listing and its version are stored as one (data, version) tuple,
+# so readers never pair a list with the version of another one
+_indexes_cache = {
+    'listing': None,
+    'timestamp': 0
+}
+INDEXES_LOCAL_TTL = 30  # seconds, bounds how stale another worker's changes can be
+# Held while the listing is reloaded, so concurrent misses share one reload
+_indexes_load_lock = threading.Lock()
+
+# Number of items matching each filter of the file list, as a (version, counts) tuple
+# for the listing version they were counted on
+_count_cache = {
+    'counts': None
+}
+MAX_CACHED_COUNTS = 256
+
+# Items of the listing grouped by type, as a (version, by_type) tuple for the listing version it was built on
+_type_index = {
+    'index': None
+}
+
+# Reload of the index listing after changes, delayed so a burst of uploads triggers only one
+REFRESH_DEBOUNCE_DELAY = 2  # seconds
+_refresh_timer = None
+_refresh_timer_lock = threading.Lock()
+
 # Cache storage for folder structure
 _folder_cache = {
     'data': None,
     'timestamp': 0,
+    'version': '',
     'is_loading': False
 }
 
@@ -41,21 +78,11 @@ _empty_folders = set()
 # Store the empty folders information in the bucket root
 _empty_folders_file = 'empty_folders.json'
 
-# Global loading state flag
-_cache_loading = False
-
 def _ensure_bucket_exists():
     """Ensure the GCS bucket exists and is accessible."""
     try:
-        client = get_storage_client()
-        bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-        if not bucket_name:
-            raise ValueError("GCS_BUCKET_NAME environment variable or config not set")
-            
-        bucket = client.bucket(bucket_name)
-        if not bucket.exists():
-            current_app.logger.info(f"Creating bucket {bucket_name}")
-            bucket.create()
+        # The bucket itself is checked once when the storage client is created
+        bucket = get_bucket()
             
         # Create the cache directory structure if it doesn't exist
         cache_blob = bucket.blob('cache/')
@@ -69,34 +96,23 @@ def _ensure_bucket_exists():
         raise
 
 def is_cache_loading():
-    """Check if the cache is currently being loaded or refreshed."""
-    global _cache_loading
-    return _cache_loading
-
-def set_cache_loading(state):
-    """Set the cache loading state."""
-    global _cache_loading
-    _cache_loading = state
+    """Check if the index listing is currently being reloaded."""
+    return _indexes_load_lock.locked()
 
 def _load_empty_folders():
     """Load empty folders from persistent storage in the bucket"""
     global _empty_folders
     try:
         # Get storage client and bucket
-        client = get_storage_client()
-        bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-        if not bucket_name:
-            raise ValueError("GCS_BUCKET_NAME environment variable or config not set")
-            
-        bucket = client.bucket(bucket_name)
+        bucket = get_bucket()
         blob = bucket.blob(_empty_folders_file)
         
-        if blob.exists():
+        try:
             # Download and parse the empty folders JSON
-            content = blob.download_as_string()
+            content = blob.download_as_bytes()
             _empty_folders = set(json.loads(content))
             current_app.logger.info(f"Loaded {len(_empty_folders)} empty folders from bucket")
-        else:
+        except NotFound:
             _empty_folders = set()
             _save_empty_folders()
     except Exception as e:
@@ -107,12 +123,7 @@ def _save_empty_folders():
     """Save empty folders to persistent storage in the bucket"""
     try:
         # Get storage client and bucket
-        client = get_storage_client()
-        bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-        if not bucket_name:
-            raise ValueError("GCS_BUCKET_NAME environment variable or config not set")
-            
-        bucket = client.bucket(bucket_name)
+        bucket = get_bucket()
         blob = bucket.blob(_empty_folders_file)
         
         # Convert set to list for JSON serialization and save to bucket
@@ -124,67 +135,220 @@ def _save_empty_folders():
         current_app.logger.error(f"Error saving empty folders: {str(e)}")
 
 
+def _content_version(data):
+    """
+    Hash a cached listing, so that workers holding the same data report the same version.
+    Computed when the listing is loaded, not on every request.
+    """
+    return hashlib.md5(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+def get_listing_version():
+    """
+    Get a version string of the cached index listing and folder structure,
+    which changes whenever either of them changes. Used to build page ETags.
+    """
+    listing = _indexes_cache['listing']
+    indexes_version = listing[1] if listing is not None else ''
+    return f"{indexes_version}-{_folder_cache['version']}"
+
+def _set_folder_cache(folders):
+    """Store the folder structure and its version"""
+    _folder_cache['data'] = folders
+    _folder_cache['version'] = _content_version(folders)
+    _folder_cache['timestamp'] = time.time()
+
 def _is_folder_cache_valid():
     """Check if the folder cache is still valid based on TTL"""
     return (_folder_cache['data'] is not None and 
             time.time() - _folder_cache['timestamp'] < CACHE_TTL)
 
-# Store app reference for background threads
-_app_ref = None
+def _get_redis_client():
+    """
+    Get the shared Redis client used to cache the index listing across workers.
+    Returns None when REDIS_URL is not configured or Redis is unavailable.
+    """
+    global _redis_client
+    if _redis_client is None and redis is not None:
+        redis_url = os.getenv("REDIS_URL")
+        if redis_url:
+            # The client owns a connection pool that every request reuses
+            _redis_client = redis.Redis.from_url(
+                redis_url,
+                max_connections=50,
+                socket_timeout=1,
+                socket_connect_timeout=1
+            )
+    return _redis_client
 
-# The synchronous version of the reload cache function
-def _sync_reload_cache():
-    """Synchronously reload the file index cache"""
-    if _file_index_cache['is_loading']:
-        current_app.logger.debug("Cache reload already in progress")
-        return _file_index_cache['data'] or []
-        
+def _get_shared_indexes():
+    """Read the cached index listing from Redis, None on a miss"""
+    client = _get_redis_client()
+    if client is None:
+        return None
     try:
-        _file_index_cache['is_loading'] = True
-        current_app.logger.info("Starting synchronous reload of file index cache")
-        
-        # Ensure bucket exists before proceeding
-        _ensure_bucket_exists()
-        
-        # Get GCS client and bucket
-        client = get_storage_client()
-        bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-        bucket = client.bucket(bucket_name)
-        
-        # List blobs with cache/ prefix - only using standardized formats
-        vector_blobs = list(bucket.list_blobs(prefix="cache/vector_index_"))
-        metadata_blobs = list(bucket.list_blobs(prefix="cache/metadata_"))
+        cached = client.get(INDEXES_CACHE_KEY)
+        return json.loads(cached) if cached else None
+    except Exception as e:
+        current_app.logger.warning(f"Could not read indexes from Redis: {str(e)}")
+        return None
+
+def _set_shared_indexes(indexes):
+    """Store the index listing in Redis with a short TTL"""
+    client = _get_redis_client()
+    if client is None:
+        return
+    try:
+        client.setex(INDEXES_CACHE_KEY, CACHE_TTL, json.dumps(indexes))
+    except Exception as e:
+        current_app.logger.warning(f"Could not write indexes to Redis: {str(e)}")
+
+def invalidate_shared_indexes():
+    """Drop the cached index listing so every worker reloads it from storage"""
+    client = _get_redis_client()
+    if client is None:
+        return
+    try:
+        client.delete(INDEXES_CACHE_KEY)
+    except Exception as e:
+        current_app.logger.warning(f"Could not invalidate indexes in Redis: {str(e)}")
+
+def _index_entry(metadata):
+    """Build the index listing entry of an item from its metadata"""
+    title = metadata.get('title', 'Untitled')
+    storage_path = metadata.get('_storage_path', '')
+    return {
+        'id': metadata.get('id', ''),
+        'notion_id': metadata.get('notion_id', ''),
+        'title': title,
+        # Folded once here so title filters don't lowercase every item per request
+        '_title_lc': (title or '').casefold(),
+        'type': metadata.get('type', 'document') == 'document' and metadata.get('format', 'unknown') or metadata.get('type', 'unknown'),
+        'folder': metadata.get('folder', ''),
+        'path': metadata.get('folder', ''),
+        '_storage_path': storage_path,
+        # Shown in the content list, built once here instead of on every listing request
+        'display_path': storage_path.replace('cache/', '')
+    }
+
+def _update_cached_entries(updated=None, removed=None):
+    """
+    Patch the cached listing for changed items instead of reloading it:
+    updated items get entries built from their new metadata, removed items are dropped.
+    
+    Args:
+        updated (Dict[str, Dict], optional): The new metadata of each updated item, by item ID
+        removed (Iterable[str], optional): The IDs of the removed items
         
-        # Create a dictionary of metadata by ID
-        metadata_dict = {}
-        for blob in metadata_blobs:
+    Returns:
+        bool: True if every item was patched, False if the listing must be reloaded instead
+    """
+    # Patches and reloads replace the whole listing, one at a time so none of them is lost
+    with _indexes_load_lock:
+        listing = _indexes_cache['listing']
+        if listing is None:
+            return False
+        indexes = listing[0]
+        
+        positions = {item['id']: position for position, item in enumerate(indexes)}
+        entries = {}
+        folders_changed = False
+        for metadata in (updated or {}).values():
+            entry = _index_entry(metadata)
+            position = positions.get(entry['id'])
+            # New items need the full reload
+            if not entry['id'] or position is None:
+                return False
+            folders_changed = folders_changed or indexes[position]['folder'] != entry['folder']
+            entries[position] = entry
+        
+        removed_positions = set()
+        for item_id in removed or ():
+            position = positions.get(item_id)
+            if position is None:
+                return False
+            removed_positions.add(position)
+        
+        # Build a patched copy, readers may be iterating over the current list
+        patched = [
+            entries.get(position, item) for position, item in enumerate(indexes)
+            if position not in removed_positions
+        ]
+        
+        _indexes_cache['listing'] = (patched, _content_version(patched))
+        _set_shared_indexes(patched)
+        
+        # Folders are derived from the items, rebuild them once an item left or changed folder
+        if removed_positions or folders_changed:
+            _folder_cache['timestamp'] = 0
+        return True
+
+def _load_indexes_from_storage():
+    """
+    Load the index listing of every item from the metadata blobs in storage.
+    
+    Returns:
+        List[Dict[str, Any]]: A list of available indexes, None if the listing failed
+    """
+    # Get indexes from storage
+    bucket = get_bucket()
+    indexes = []
+    
+    # List all metadata files in the cache folder
+    try:
+        blobs = list(bucket.list_blobs(prefix="cache/metadata_", fields=NAME_LISTING_FIELDS))
+    except Exception as e:
+        current_app.logger.error(f"Error listing blobs: {str(e)}")
+        return None
+    
+    for blob in blobs:
+        if blob.name.startswith("cache/metadata_"):
             try:
-                # Extract ID from the blob name using only standardized format
-                blob_name = blob.name
-                item_id = blob_name.split("metadata_")[1].replace('.pkl', '')
-                metadata = download_blob_to_memory(blob_name)
-                metadata_dict[item_id] = metadata
+                # Download and parse metadata
+                metadata_bytes = blob.download_as_bytes()
+                if not metadata_bytes:
+                    continue
+                    
+                metadata = pickle.loads(metadata_bytes)
+                if not metadata:
+                    continue
+                
+                # Add the item's ID and other relevant info
+                indexes.append(_index_entry(metadata))
             except Exception as e:
-                current_app.logger.error(f"Error processing metadata blob {blob_name}: {str(e)}")
+                current_app.logger.error(f"Error loading metadata from {blob.name}: {str(e)}")
                 continue
-        
-        indexes = []
-        for blob in vector_blobs:
-            index_info = _process_vector_blob(blob.name, metadata_dict)
-            if index_info:
-                indexes.append(index_info)
-        
-        # Update cache with new data
-        _file_index_cache['data'] = indexes
-        _file_index_cache['timestamp'] = time.time()
-        current_app.logger.info(f"Sync file index cache update completed with {len(indexes)} items")
-        return indexes
-        
-    except Exception as e:
-        current_app.logger.error(f"Error in sync cache reload: {str(e)}")
-        return []
-    finally:
-        _file_index_cache['is_loading'] = False
+    
+    return indexes
+
+def _is_indexes_cache_fresh():
+    """Check if the per-process index listing can be served without reloading it"""
+    return (_indexes_cache['listing'] is not None and
+            time.monotonic() - _indexes_cache['timestamp'] < INDEXES_LOCAL_TTL)
+
+def _get_indexes_listing():
+    """
+    Get the index listing together with its version, reloading it when needed.
+    
+    Returns:
+        Tuple[List[Dict[str, Any]], str]: The listing and its version, an empty list and None if loading failed
+    """
+    # Serve the listing from this process, then from the shared cache when possible
+    listing = _indexes_cache['listing']
+    if not _is_indexes_cache_fresh():
+        with _indexes_load_lock:
+            # Requests waiting on the lock use the listing the first one just loaded
+            listing = _indexes_cache['listing']
+            if not _is_indexes_cache_fresh():
+                indexes = _get_shared_indexes()
+                if indexes is None:
+                    indexes = _load_indexes_from_storage()
+                    if indexes is None:
+                        return [], None
+                    _set_shared_indexes(indexes)
+                listing = (indexes, _content_version(indexes))
+                _indexes_cache['listing'] = listing
+                _indexes_cache['timestamp'] = time.monotonic()
+    return listing
 
 def get_available_indexes(folder_path=None):
     """
@@ -198,83 +362,145 @@ def get_available_indexes(folder_path=None):
         List[Dict[str, Any]]: A list of available indexes, empty list if error occurs
     """
     try:
-        # Get indexes from storage
-        client = get_storage_client()
-        bucket_name = os.getenv("GCS_BUCKET_NAME")
-        if not bucket_name:
-            current_app.logger.error("GCS_BUCKET_NAME environment variable not set")
-            return []
-        
-        bucket = client.bucket(bucket_name)
-        indexes = []
-        
-        # List all metadata files in the cache folder
-        try:
-            blobs = list(bucket.list_blobs(prefix="cache/"))
-        except Exception as e:
-            current_app.logger.error(f"Error listing blobs: {str(e)}")
-            return []
-        
-        for blob in blobs:
-            if blob.name.startswith("cache/metadata_"):
-                try:
-                    blob_name = blob.name
-                    
-                    # Download and parse metadata
-                    metadata_bytes = blob.download_as_bytes()
-                    if not metadata_bytes:
-                        continue
-                        
-                    metadata = pickle.loads(metadata_bytes)
-                    if not metadata:
-                        continue
-                    
-                    # Get the item's folder path
-                    item_folder = metadata.get('folder', '')
-                    
-                    # Include item if:
-                    # 1. No folder filter is applied (folder_path is None)
-                    # 2. Item is exactly in the requested folder
-                    # 3. Item is in a subfolder of the requested folder (item_folder starts with folder_path/)
-                    should_include = (
-                        folder_path is None or
-                        item_folder == folder_path or
-                        (folder_path and item_folder and 
-                         item_folder.startswith(folder_path + '/'))
-                    )
-                    
-                    if should_include:
-                        # Add the item's ID and other relevant info
-                        index_item = {
-                            'id': metadata.get('id', ''),
-                            'notion_id': metadata.get('notion_id', ''),
-                            'title': metadata.get('title', 'Untitled'),
-                            'type': metadata.get('type', 'document') == 'document' and metadata.get('format', 'unknown') or metadata.get('type', 'unknown'),
-                            'folder': item_folder,
-                            'path': metadata.get('folder', ''),
-                            '_storage_path': metadata.get('_storage_path', '')
-                        }
-                        indexes.append(index_item)
-                except Exception as e:
-                    current_app.logger.error(f"Error loading metadata from {blob.name}: {str(e)}")
-                    continue
-        
-        return indexes or []
+        indexes, _ = _get_indexes_listing()
+        
+        if folder_path is None:
+            return indexes
+        
+        # Include item if:
+        # 1. Item is exactly in the requested folder
+        # 2. Item is in a subfolder of the requested folder (item_folder starts with folder_path/)
+        return [
+            item for item in indexes
+            if item['folder'] == folder_path or
+            (folder_path and item['folder'] and item['folder'].startswith(folder_path + '/'))
+        ]
     except Exception as e:
         current_app.logger.error(f"Error in get_available_indexes: {str(e)}")
         return []
-    finally:
-        set_cache_loading(False)
 
-def refresh_file_index_cache():
+def _iter_matching_indexes(indexes, folder_path, needle, index_type):
+    """Yield the items of the listing matching the filters, in listing order"""
+    for item in indexes:
+        if folder_path is not None and not (
+            item['folder'] == folder_path or
+            (folder_path and item['folder'] and item['folder'].startswith(folder_path + '/'))
+        ):
+            continue
+        if index_type and item['type'] != index_type:
+            continue
+        if needle and needle not in item['_title_lc']:
+            continue
+        yield item
+
+def _indexes_of_type(indexes, version, index_type):
+    """
+    Get the items of the listing to scan for a type filter.
+    Items are grouped by type once per listing version, so a type filter only walks its own items.
+    The version must be the one of this listing, as returned with it by _get_indexes_listing.
+    """
+    if not index_type:
+        return indexes
+    
+    type_index = _type_index['index']
+    if type_index is None or type_index[0] != version:
+        by_type = {}
+        for item in indexes:
+            by_type.setdefault(item['type'], []).append(item)
+        # Stored with the version of the list it was built from, in one assignment
+        type_index = (version, by_type)
+        _type_index['index'] = type_index
+    return type_index[1].get(index_type, [])
+
+def query_available_indexes(folder_path=None, *, title=None, index_type=None, offset=0, limit=None):
+    """
+    Get one page of the indexed content matching the given filters.
+    Only the requested page is copied, and the match count is cached per filter
+    until the listing changes, so paging through results stops scanning at the page end.
+    
+    Args:
+        folder_path (str, optional): The folder path to filter by, including its subfolders
+        title (str, optional): Only keep items whose title contains this text, ignoring case
+        index_type (str, optional): Only keep items of this type
+        offset (int): Number of matching items to skip
+        limit (int, optional): Maximum number of items to return, all remaining ones if None
+        
+    Returns:
+        Tuple[List[Dict[str, Any]], int]: The page of items and the total number of matching items
+    """
+    try:
+        all_indexes, version = _get_indexes_listing()
+    except Exception as e:
+        current_app.logger.error(f"Error in query_available_indexes: {str(e)}")
+        return [], 0
+    
+    indexes = _indexes_of_type(all_indexes, version, index_type)
+    needle = title.casefold() if title else None
+    end = offset + limit if limit is not None else None
+    
+    page = list(islice(_iter_matching_indexes(indexes, folder_path, needle, index_type), offset, end))
+    return page, _count_matching_indexes(indexes, version, folder_path, needle, index_type)
+
+def _count_matching_indexes(indexes, version, folder_path, needle, index_type):
+    """
+    Count the items of the listing matching the filters, cached until the listing changes.
+    The version must be the one of this listing, as returned with it by _get_indexes_listing.
+    """
+    # Counts are only valid for the listing they were computed on
+    cached = _count_cache['counts']
+    if cached is None or cached[0] != version:
+        cached = (version, {})
+        _count_cache['counts'] = cached
+    
+    counts = cached[1]
+    count_key = (folder_path, needle, index_type or None)
+    total = counts.get(count_key)
+    if total is None:
+        # Every typed title search adds a key, start over rather than growing without bound
+        if len(counts) >= MAX_CACHED_COUNTS:
+            counts.clear()
+        total = sum(1 for _ in _iter_matching_indexes(indexes, folder_path, needle, index_type))
+        counts[count_key] = total
+    return total
+
+def _warm_indexes_cache(app):
+    """Reload the index listing and folders in the background so the next page load doesn't wait for them"""
+    with app.app_context():
+        get_available_indexes()
+        _sync_reload_folder_cache()
+
+def refresh_file_index_cache(updated=None, removed=None):
     """
     Force a refresh of the file index cache.
-    Now performs a synchronous reload to ensure fresh data is returned immediately.
+    The cached listings are dropped immediately so the next read sees the change,
+    and the listing is reloaded in the background once a burst of changes has settled.
     Call this after adding or deleting files.
+    
+    Args:
+        updated (Dict[str, Dict], optional): The metadata just written for existing items, by item ID.
+        removed (Iterable[str], optional): The IDs of items just deleted.
+            Only the entries of these items are patched, instead of reloading the whole listing.
     """
-    current_app.logger.info("Force-refreshing file index cache synchronously")
-    # Use the synchronous reload method instead of async
-    return _sync_reload_cache()
+    global _refresh_timer
+    if (updated or removed) and _update_cached_entries(updated, removed):
+        current_app.logger.info("Patched the cached index entries of the changed items")
+        return
+    
+    current_app.logger.info("Invalidating file index cache")
+    # Drop the cached listings so the next read sees the change
+    _indexes_cache['listing'] = None
+    invalidate_shared_indexes()
+    # Items may have been added to new folders, keep the old folder list only as a fallback
+    _folder_cache['timestamp'] = 0
+    
+    # Restart the countdown on every change, only the last one triggers the reload
+    app = current_app._get_current_object()
+    with _refresh_timer_lock:
+        if _refresh_timer is not None:
+            _refresh_timer.cancel()
+        _refresh_timer = threading.Timer(REFRESH_DEBOUNCE_DELAY, _warm_indexes_cache, args=(app,))
+        _refresh_timer.daemon = True
+        _refresh_timer.start()
 
 def _update_item_metadata(item_id: str, metadata_update: Dict):
     """
@@ -283,11 +509,12 @@ def _update_item_metadata(item_id: str, metadata_update: Dict):
     Args:
         item_id (str): The item ID
         metadata_update (Dict): The metadata updates to apply
+        
+    Returns:
+        Dict: The updated metadata
     """
     try:
-        client = get_storage_client()
-        bucket_name = os.getenv("GCS_BUCKET_NAME") or current_app.config.get('GCS_BUCKET_NAME')
-        bucket = client.bucket(bucket_name)
+        bucket = get_bucket()
         
         # Only use standardized metadata blob format
         metadata_blob_name = f"cache/metadata_{item_id}.pkl"
@@ -306,6 +533,7 @@ def _update_item_metadata(item_id: str, metadata_update: Dict):
             metadata_blob.upload_from_file(file_buffer)
             
         current_app.logger.info(f"Updated metadata for item {item_id}")
+        return metadata
         
     except Exception as e:
         current_app.logger.error(f"Error updating metadata for item {item_id}: {str(e)}")
@@ -324,15 +552,15 @@ def move_item_to_folder(item_id: str, folder_path: str):
         _ensure_folder_exists(folder_path)
         
         # Update item metadata with new folder
-        _update_item_metadata(item_id, {'folder': folder_path})
+        metadata = _update_item_metadata(item_id, {'folder': folder_path})
         
         # If the folder was previously empty, it's now used by an item
         if folder_path in _empty_folders:
             _empty_folders.remove(folder_path)
             _save_empty_folders()
         
-        # Force a full cache refresh sequence
-        refresh_file_index_cache()
+        # Update the moved item in the cached listing, then the folders
+        refresh_file_index_cache(updated={item_id: metadata})
         _sync_reload_folder_cache()
         
     except Exception as e:
@@ -341,13 +569,11 @@ def move_item_to_folder(item_id: str, folder_path: str):
 
 def _sync_reload_folder_cache():
     """Synchronously reload the folder cache"""
-    global _cache_loading
     if _folder_cache['is_loading']:
         current_app.logger.debug("Folder cache reload already in progress")
         return _folder_cache['data'] or []
         
     try:
-        set_cache_loading(True)
         _folder_cache['is_loading'] = True
         current_app.logger.info("Starting synchronous reload of folder cache")
         
@@ -424,8 +650,7 @@ def _sync_reload_folder_cache():
         folders.sort(key=lambda x: x['path'])
         
         # Update cache with new data
-        _folder_cache['data'] = folders
-        _folder_cache['timestamp'] = time.time()
+        _set_folder_cache(folders)
         current_app.logger.info(f"Sync folder cache update completed with {len(folders)} folders")
         return folders
         
@@ -433,7 +658,6 @@ def _sync_reload_folder_cache():
         current_app.logger.error(f"Error in sync folder cache reload: {str(e)}")
         return []
     finally:
-        set_cache_loading(False)
         _folder_cache['is_loading'] = False
 
 def get_folders():
@@ -537,8 +761,7 @@ def _ensure_folder_exists(folder_path: str):
                 })
     
     # Update the folder cache
-    _folder_cache['data'] = folders
-    _folder_cache['timestamp'] = time.time()
+    _set_folder_cache(folders)
 
 def rename_folder(folder_path: str, new_name: str):
     """
@@ -576,6 +799,7 @@ def rename_folder(folder_path: str, new_name: str):
                           item['folder'].startswith(f"{folder_path}/")]
                           
         # Update each item's folder path
+        updated = {}
         for item in affected_items:
             old_folder = item['folder']
             if old_folder == folder_path:
@@ -585,7 +809,7 @@ def rename_folder(folder_path: str, new_name: str):
                 # Item in subfolder
                 new_folder = old_folder.replace(folder_path, new_path, 1)
                 
-            _update_item_metadata(item['id'], {'folder': new_folder})
+            updated[item['id']] = _update_item_metadata(item['id'], {'folder': new_folder})
         
         # Update empty folders list for subfolders
         global _empty_folders
@@ -605,8 +829,8 @@ def rename_folder(folder_path: str, new_name: str):
         _empty_folders = updated_empty_folders
         _save_empty_folders()
             
-        # Refresh caches
-        refresh_file_index_cache()
+        # Refresh caches, only the moved items change in the listing
+        refresh_file_index_cache(updated=updated)
         _sync_reload_folder_cache()
         
         current_app.logger.info(f"Renamed folder from {folder_path} to {new_path}, affecting {len(affected_items)} items")
@@ -647,8 +871,9 @@ def delete_folder(folder_path: str, delete_contents: bool = False):
         parent_path = '/'.join(path_parts[:-1])
         
         # Move all items to the parent folder (including those in subfolders)
+        updated = {}
         for item in affected_items:
-            _update_item_metadata(item['id'], {'folder': parent_path})
+            updated[item['id']] = _update_item_metadata(item['id'], {'folder': parent_path})
         
         # Remove the deleted folder and all its subfolders from the empty folders list
         global _empty_folders
@@ -668,8 +893,8 @@ def delete_folder(folder_path: str, delete_contents: bool = False):
         # Save the updated empty folders list
         _save_empty_folders()
             
-        # Refresh caches
-        refresh_file_index_cache()
+        # Refresh caches, only the moved items change in the listing
+        refresh_file_index_cache(updated=updated)
         _sync_reload_folder_cache()
         
         current_app.logger.info(f"Deleted folder {folder_path}, moved {len(affected_items)} items to {parent_path}")
@@ -678,44 +903,3 @@ def delete_folder(folder_path: str, delete_contents: bool = False):
     except Exception as e:
         current_app.logger.error(f"Error deleting folder {folder_path}: {str(e)}")
         raise
-
-def _process_vector_blob(blob_name: str, metadata_dict: Dict[str, Any]) -> Dict[str, Any]:
-    """Process a vector blob and return its index information"""
-    if not blob_name.endswith('.pkl'):
-        return None
-    
-    # Only support standardized ID format
-    if "vector_index_" in blob_name:
-        clean_id = blob_name.split("vector_index_")[1].replace('.pkl', '')
-        item_type = 'page'
-    else:
-        return None
-        
-    title = f"{item_type.capitalize()}: {clean_id[:8]}..."
-    themes = []
-    keywords = []
-    folder = ""
-    
-    # Get metadata if available
-    if clean_id in metadata_dict:
-        metadata = metadata_dict[clean_id]
-        if 'title' in metadata:
-            title = metadata['title']
-        if 'format' in metadata and item_type == 'document':
-            item_type = metadata['format']
-        if 'folder' in metadata:
-            folder = metadata['folder']
-        if 'auto_metadata' in metadata:
-            auto_metadata = metadata['auto_metadata']
-            themes = auto_metadata.get('themes', [])[:3]
-            keywords = auto_metadata.get('keywords', [])[:5]
-    
-    return {
-        'id': clean_id,
-        'type': item_type,
-        'title': title,
-        'path': blob_name,
-        'folder': folder,
-        'themes': themes,
-        'keywords': keywords
-    }
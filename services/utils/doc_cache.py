@@ -0,0 +1,107 @@
+"""
+Read access to the cached document data saved next to each index
+"""
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from services.storage_service import get_bucket, NAME_LISTING_FIELDS
+
+# Shared pool for reading document data in the background, created on first use
+_executor = None
+_executor_lock = threading.Lock()
+PREFETCH_WORKERS = 4
+
+def _get_executor():
+    """Get the shared background read pool"""
+    global _executor
+    if _executor is not None:
+        return _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="doc-cache")
+
+    return _executor
+
+def _batch_number(blob_name):
+    """Get the batch number of a batched data blob name"""
+    try:
+        return int(blob_name.rsplit('_batch_', 1)[1].replace('.pkl', ''))
+    except (IndexError, ValueError):
+        return 0
+
+def get_document_data_blob_names(item_id):
+    """
+    List the data blobs of an item with a single listing request.
+    Documents and Notion pages are saved in one blob, PDFs in numbered batches.
+
+    Args:
+        item_id (str): The item ID
+
+    Returns:
+        list: The blob names, batches in order
+    """
+    single_name = f"cache/data_{item_id}.pkl"
+    batch_prefix = f"cache/data_{item_id}_batch_"
+
+    bucket = get_bucket()
+    names = [
+        blob.name for blob in bucket.list_blobs(prefix=f"cache/data_{item_id}", fields=NAME_LISTING_FIELDS)
+        # The prefix also matches longer IDs starting with this one
+        if blob.name == single_name or blob.name.startswith(batch_prefix)
+    ]
+    return sorted(names, key=_batch_number)
+
+def load_document_texts(item_id, max_chars=None):
+    """
+    Load the text of the cached documents of an item.
+
+    Args:
+        item_id (str): The item ID
+        max_chars (int, optional): Stop reading further blobs once this much text is loaded
+
+    Returns:
+        list: The text of each document, empty if the item has no cached data
+    """
+    bucket = get_bucket()
+    texts = []
+    text_length = 0
+
+    for blob_name in get_document_data_blob_names(item_id):
+        try:
+            documents = pickle.loads(bucket.blob(blob_name).download_as_bytes())
+        except Exception as e:
+            current_app.logger.warning(f"Error reading document data {blob_name}: {str(e)}")
+            continue
+
+        for doc in documents:
+            text = getattr(doc, 'text', None)
+            if text:
+                texts.append(text)
+                text_length += len(text)
+
+        if max_chars is not None and text_length >= max_chars:
+            break
+
+    return texts
+
+def _load_document_texts_in_app_context(app, item_id, max_chars):
+    """Load the document texts from a pool thread"""
+    with app.app_context():
+        return load_document_texts(item_id, max_chars=max_chars)
+
+def prefetch_document_texts(item_id, max_chars=None):
+    """
+    Start loading the text of the cached documents of an item in the background,
+    so the downloads overlap with other requests made by the caller.
+
+    Args:
+        item_id (str): The item ID
+        max_chars (int, optional): Stop reading further blobs once this much text is loaded
+
+    Returns:
+        concurrent.futures.Future: The future holding the list of texts
+    """
+    app = current_app._get_current_object()
+    return _get_executor().submit(_load_document_texts_in_app_context, app, item_id, max_chars)
@@ -0,0 +1,46 @@
+"""
+Shared HTTP client for the OpenAI API calls
+"""
+import atexit
+import threading
+import httpx
+
+# Default timeout for LLM calls, connecting should never take long
+HTTP_TIMEOUT = httpx.Timeout(300.0, connect=5.0)
+# Keep enough warm connections for request bursts, and drop idle ones before the server does
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=40, max_connections=100, keepalive_expiry=30.0)
+
+# Shared clients, created on first use so each forked worker gets its own pool
+_http_client = None
+_async_http_client = None
+_http_client_lock = threading.Lock()
+
+def get_http_client():
+    """
+    Get the shared HTTP client.
+    Reusing it keeps the connections to the LLM provider alive between requests.
+    """
+    global _http_client
+    if _http_client is not None:
+        return _http_client
+
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+            atexit.register(_http_client.close)
+
+    return _http_client
+
+def get_async_http_client():
+    """
+    Get the shared asynchronous HTTP client, used by the agents on the shared event loop.
+    """
+    global _async_http_client
+    if _async_http_client is not None:
+        return _async_http_client
+
+    with _http_client_lock:
+        if _async_http_client is None:
+            _async_http_client = httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+
+    return _async_http_client
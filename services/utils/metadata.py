@@ -7,7 +7,10 @@ import httpx
 import re
 from flask import current_app
 from openai import OpenAI
-   
+from services.utils.http_client import get_http_client
+
+# Number of characters of a document sent to the model, usually enough for metadata
+METADATA_SAMPLE_SIZE = 4000
 
 def extract_auto_metadata(text_content):
     """
@@ -30,11 +33,12 @@ def extract_auto_metadata(text_content):
         # Create OpenAI client
         client = OpenAI(
             api_key=openai_api_key,
-            timeout=httpx.Timeout(connect=5.0, read=30.0, write=10.0, pool=10.0)
+            timeout=httpx.Timeout(connect=5.0, read=30.0, write=10.0, pool=10.0),
+            http_client=get_http_client()
         )
         
-        # Prepare a sample of the text (first 4000 chars is usually enough for metadata)
-        text_sample = text_content[:4000] if len(text_content) > 4000 else text_content
+        # Prepare a sample of the text
+        text_sample = text_content[:METADATA_SAMPLE_SIZE]
         
         # Create the prompt for metadata extraction
         prompt = f"""